@@ -0,0 +1,407 @@
+"""Agregados materializados da DRE no Postgres.
+
+Job em lote: `python dre/agregados.py [--empresa TeutoMaq] [--ano 2024]` lê as planilhas
+de cada conjunto registrado (ver datasets.py) e grava, por (empresa, ano):
+- dre_monthly: uma linha por (mês, linha da DRE), mês 0 = anual;
+- dre_top_cost_centers: top-N centros de custo por mês;
+- dre_billing_summary / dre_top_billing: totais e top-N vendedores/clientes do faturamento.
+
+As páginas recebem uma fonte de agregados (fonte_agregados): com o engine do portal e
+as tabelas preenchidas leem no máximo algumas centenas de linhas por página, em vez de
+milhares de lançamentos; senão calculam das planilhas. dre_refresh guarda a assinatura
+(nome, mtime e tamanho) das planilhas usadas pelo job: se as planilhas mudaram depois, as
+páginas voltam a calcular das planilhas até o próximo job.
+DRE_FONTE=planilhas força o cálculo local.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from cache import CacheLRU
+from dados import carregar_contas, carregar_faturamento, fingerprint, versao_contas
+from datasets import ANO_PADRAO, EMPRESA_PADRAO, Dataset, listar, obter, resolver
+from kpis import calcular_kpis, dre_mensal, kpis_da_linha
+from motor_dre import ANUAL, DRE_COLUNAS, MESES_IDX
+
+TOP_N = 10
+FONTE = os.environ.get('DRE_FONTE', 'auto')
+# Segundos que a consulta a dre_refresh fica guardada (uma por página sem isto)
+TTL_REFRESH = float(os.environ.get('DRE_REFRESH_TTL', 10))
+
+_cache = CacheLRU(32)
+_refresh = {}  # (url, empresa, ano) -> (momento da consulta, linha de dre_refresh)
+_refresh_lock = threading.Lock()
+
+DDL = [
+    """CREATE TABLE IF NOT EXISTS dre_monthly (
+        company text NOT NULL, year integer NOT NULL, month smallint NOT NULL,
+        line text NOT NULL, value double precision NOT NULL,
+        PRIMARY KEY (company, year, month, line))""",
+    """CREATE TABLE IF NOT EXISTS dre_top_cost_centers (
+        company text NOT NULL, year integer NOT NULL, month smallint NOT NULL,
+        rank smallint NOT NULL, cost_center text NOT NULL, value double precision NOT NULL,
+        PRIMARY KEY (company, year, month, rank))""",
+    """CREATE TABLE IF NOT EXISTS dre_billing_summary (
+        company text NOT NULL, year integer NOT NULL, month smallint NOT NULL,
+        total double precision NOT NULL, sales integer NOT NULL, clients integer NOT NULL,
+        column_total double precision NOT NULL,
+        PRIMARY KEY (company, year, month))""",
+    """CREATE TABLE IF NOT EXISTS dre_top_billing (
+        company text NOT NULL, year integer NOT NULL, month smallint NOT NULL,
+        dimension text NOT NULL, rank smallint NOT NULL, name text NOT NULL,
+        value double precision NOT NULL,
+        PRIMARY KEY (company, year, month, dimension, rank))""",
+    """CREATE TABLE IF NOT EXISTS dre_refresh (
+        company text NOT NULL, year integer NOT NULL, refreshed_at timestamp with time zone NOT NULL,
+        source_signature text,
+        PRIMARY KEY (company, year))""",
+]
+
+# tabela -> colunas gravadas além de (company, year)
+TABELAS = {
+    'dre_monthly': ['month', 'line', 'value'],
+    'dre_top_cost_centers': ['month', 'rank', 'cost_center', 'value'],
+    'dre_billing_summary': ['month', 'total', 'sales', 'clients', 'column_total'],
+    'dre_top_billing': ['month', 'dimension', 'rank', 'name', 'value'],
+}
+
+
+# ───────────────────────────── cálculo (pandas) ─────────────────────────────
+
+def dre_longo(dre):
+    """DRE larga (mês x linha) no formato da tabela dre_monthly."""
+    longo = dre[DRE_COLUNAS].rename_axis('month').reset_index().melt(
+        id_vars='month', var_name='line', value_name='value')
+    return longo.astype({'month': int})
+
+
+def dre_largo(longo):
+    """Inverso de dre_longo: mesmo formato de kpis.dre_mensal."""
+    dre = longo.pivot(index='month', columns='line', values='value')
+    dre = dre.reindex(index=MESES_IDX + [ANUAL], columns=DRE_COLUNAS).fillna(0.0)
+    dre.index.name = 'mes'
+    dre.columns.name = None
+    return dre
+
+
+def _top(serie, n):
+    top = serie.nlargest(n)
+    return pd.DataFrame({'rank': range(1, len(top) + 1), 'name': top.index, 'value': top.to_numpy()})
+
+
+def centros_de_custo(cpa, n=TOP_N):
+    """Top-N centros de custo (Setor Cons.) por gasto, para cada mês e para o ano (mês 0)."""
+    partes = []
+    for mes in [ANUAL] + MESES_IDX:
+        linhas = cpa if mes == ANUAL else cpa[cpa['Mes'] == mes]
+        top = _top(linhas.groupby('Setor Cons.', observed=True)['Valor'].sum(), n)
+        partes.append(top.rename(columns={'name': 'cost_center'}).assign(month=mes))
+    return pd.concat(partes, ignore_index=True)[TABELAS['dre_top_cost_centers']]
+
+
+def _top_por_mes(totais, n):
+    # totais: Series indexada por (month, name); top-N de cada mês, empates na ordem dos nomes
+    top = totais.groupby(level='month', group_keys=False).nlargest(n).rename('value').reset_index()
+    top['rank'] = top.groupby('month').cumcount() + 1
+    return top
+
+
+def faturamento(longo, n=TOP_N):
+    """(resumo, top) do faturamento por mês e anual, com as mesmas regras da página.
+
+    Parte do formato longo (dados.faturamento_longo): cada total sai de um único groupby
+    por (mês, vendedor/cliente), em vez de um filtro e um groupby por mês.
+    No mês entram só as vendas com valor positivo; no ano, todas.
+    """
+    mensal = longo[longo['Mes'] > 0]
+    positivas = mensal[mensal['Valor'] > 0]
+    por_mes = positivas.groupby('Mes')
+    resumo = pd.DataFrame({
+        'total': por_mes['Valor'].sum(),
+        'sales': por_mes.size(),
+        'clients': por_mes['Cliente'].nunique(),
+        'column_total': mensal.groupby('Mes')['Valor'].sum(),
+    }).reindex(MESES_IDX, fill_value=0).rename_axis('month').reset_index()
+    total = longo['Valor'].sum()
+    ano = {'month': ANUAL, 'total': total, 'sales': longo['Venda'].nunique(),
+           'clients': longo['Cliente'].nunique(), 'column_total': total}
+    resumo = pd.concat([pd.DataFrame([ano]), resumo], ignore_index=True)
+
+    tops = []
+    for dimensao, coluna in (('vendedor', 'Vendedor'), ('cliente', 'Cliente')):
+        anual = longo.groupby(coluna, observed=True)['Valor'].sum()
+        totais = pd.concat([pd.concat({ANUAL: anual}, names=['Mes']),
+                            positivas.groupby(['Mes', coluna], observed=True)['Valor'].sum()])
+        totais.index = totais.index.set_names(['month', 'name'])
+        tops.append(_top_por_mes(totais, n).assign(dimension=dimensao))
+    top = pd.concat(tops, ignore_index=True)
+    top['name'] = top['name'].astype(object)
+    return resumo[TABELAS['dre_billing_summary']], top[TABELAS['dre_top_billing']]
+
+
+def calcular(dataset=None, n=TOP_N):
+    """Todos os agregados de um conjunto (empresa, ano), já no formato das tabelas."""
+    cpa, _ = carregar_contas(dataset)
+    resumo, top = faturamento(carregar_faturamento(dataset), n)
+    return {
+        'dre_monthly': dre_longo(dre_mensal(dataset)),
+        'dre_top_cost_centers': centros_de_custo(cpa, n),
+        'dre_billing_summary': resumo,
+        'dre_top_billing': top,
+    }
+
+
+# ───────────────────────────── Postgres ─────────────────────────────
+
+def criar_tabelas(conn):
+    for ddl in DDL:
+        conn.execute(text(ddl))
+    # dre_refresh criada antes da assinatura das planilhas
+    if 'source_signature' not in {c['name'] for c in inspect(conn).get_columns('dre_refresh')}:
+        conn.execute(text("ALTER TABLE dre_refresh ADD COLUMN source_signature text"))
+
+
+def assinatura_planilhas(dataset=None):
+    """Nome, mtime e tamanho de cada planilha do conjunto (como nos snapshots), em JSON."""
+    dataset = resolver(dataset)
+    partes = []
+    for tipo, _ in dataset.arquivos:
+        path = dataset.caminho(tipo)
+        _, mtime, tamanho = fingerprint(path)
+        partes.append([os.path.basename(path), mtime, tamanho])
+    return json.dumps(partes)
+
+
+def gravar(engine, empresa, ano, agregados, assinatura=None):
+    """Substitui, numa transação, os agregados de (empresa, ano).
+
+    `assinatura` = assinatura_planilhas() tirada antes do cálculo.
+    """
+    chave = {'company': empresa, 'year': ano}
+    with engine.begin() as conn:
+        criar_tabelas(conn)
+        for tabela, colunas in TABELAS.items():
+            conn.execute(text(f"DELETE FROM {tabela} WHERE company=:company AND year=:year"), chave)
+            registros = [{**chave, **r} for r in agregados[tabela][colunas].to_dict('records')]
+            if registros:
+                campos = ['company', 'year'] + colunas
+                conn.execute(text(f"INSERT INTO {tabela} ({','.join(campos)}) "
+                                  f"VALUES ({','.join(':' + c for c in campos)})"), registros)
+        conn.execute(text("DELETE FROM dre_refresh WHERE company=:company AND year=:year"), chave)
+        conn.execute(text("INSERT INTO dre_refresh (company, year, refreshed_at, source_signature) "
+                          "VALUES (:company, :year, :ts, :assinatura)"),
+                     {**chave, 'ts': datetime.now(timezone.utc), 'assinatura': assinatura})
+    with _refresh_lock:
+        _refresh.pop((str(engine.url), empresa, ano), None)
+
+
+def _refresh_de(engine, empresa, ano):
+    # (refreshed_at, source_signature) ou None; guardado por TTL_REFRESH segundos
+    chave = (str(engine.url), empresa, ano)
+    agora = time.monotonic()
+    with _refresh_lock:
+        guardado = _refresh.get(chave)
+    if guardado is not None and agora - guardado[0] < TTL_REFRESH:
+        return guardado[1]
+    with engine.connect() as conn:
+        linha = conn.execute(text("SELECT refreshed_at, source_signature FROM dre_refresh "
+                                  "WHERE company=:company AND year=:year"),
+                             {'company': empresa, 'year': ano}).fetchone()
+    linha = None if linha is None else tuple(linha)
+    with _refresh_lock:
+        _refresh[chave] = (agora, linha)
+    return linha
+
+
+def atualizado_em(engine, empresa, ano):
+    """Quando o job gravou os agregados de (empresa, ano); None se nunca gravou."""
+    linha = _refresh_de(engine, empresa, ano)
+    return None if linha is None else linha[0]
+
+
+def em_dia(engine, dataset=None):
+    """Os agregados gravados de `dataset` vieram das planilhas como estão agora?"""
+    dataset = resolver(dataset)
+    linha = _refresh_de(engine, dataset.empresa, dataset.ano)
+    if linha is None:
+        return False
+    try:
+        return linha[1] == assinatura_planilhas(dataset)
+    except OSError:
+        return True  # planilhas só na máquina do job: vale o que foi gravado
+
+
+def materializado(engine, empresa, ano):
+    """O job já gravou agregados para (empresa, ano)?"""
+    return atualizado_em(engine, empresa, ano) is not None
+
+
+def ler(engine, empresa, ano, tabela):
+    """Linhas de uma tabela de agregados para (empresa, ano)."""
+    colunas = TABELAS[tabela]
+    with engine.connect() as conn:
+        linhas = conn.execute(
+            text(f"SELECT {','.join(colunas)} FROM {tabela} WHERE company=:company AND year=:year"),
+            {'company': empresa, 'year': ano}).fetchall()
+    return pd.DataFrame(linhas, columns=colunas)
+
+
+# ───────────────────────────── fontes para as páginas ─────────────────────────────
+
+class _Fonte:
+    """Consultas que as páginas fazem; as subclasses só dizem de onde vêm as tabelas.
+
+    Atributos `empresa` e `ano` identificam o conjunto de dados.
+    """
+
+    def dre(self):
+        raise NotImplementedError
+
+    def versao(self):
+        """Muda sempre que os dados mudam (chave para caches derivados, ex.: graficos.py)."""
+        raise NotImplementedError
+
+    def _tabela(self, nome):
+        raise NotImplementedError
+
+    def kpis(self, periodo=ANUAL):
+        return kpis_da_linha(self.dre().loc[periodo], periodo)
+
+    def top_centros(self, mes, n):
+        top = self._tabela('dre_top_cost_centers')
+        top = top[(top['month'] == mes) & (top['rank'] <= n)].sort_values('rank')
+        return pd.Series(top['value'].to_numpy(), index=top['cost_center'].to_numpy())
+
+    def resumo_faturamento(self, mes):
+        resumo = self._tabela('dre_billing_summary')
+        return resumo[resumo['month'] == mes].iloc[0]
+
+    def top_faturamento(self, mes, dimensao, n):
+        top = self._tabela('dre_top_billing')
+        top = top[(top['month'] == mes) & (top['dimension'] == dimensao) & (top['rank'] <= n)].sort_values('rank')
+        return pd.Series(top['value'].to_numpy(), index=top['name'].to_numpy())
+
+    def evolucao_faturamento(self):
+        resumo = self._tabela('dre_billing_summary').set_index('month')
+        return resumo.loc[MESES_IDX, 'column_total'].to_numpy()
+
+
+class FontePlanilhas(_Fonte):
+    """Calcula das planilhas (cache por versão dos arquivos)."""
+
+    def __init__(self, dataset=None):
+        self.dataset = resolver(dataset)
+        self.empresa, self.ano = self.dataset.empresa, self.dataset.ano
+
+    def dre(self):
+        return dre_mensal(self.dataset)
+
+    def versao(self):
+        return ('planilhas', versao_contas(self.dataset), fingerprint(self.dataset.caminho('faturamento')))
+
+    def kpis(self, periodo=ANUAL):
+        return calcular_kpis(periodo, self.dataset)
+
+    def _tabela(self, nome):
+        if nome == 'dre_top_cost_centers':
+            return _cache.get_or_build(
+                ('centros', versao_contas(self.dataset)),
+                lambda: centros_de_custo(carregar_contas(self.dataset)[0]))
+        versao = fingerprint(self.dataset.caminho('faturamento'))
+        resumo, top = _cache.get_or_build(('faturamento', versao),
+                                          lambda: faturamento(carregar_faturamento(self.dataset)))
+        return resumo if nome == 'dre_billing_summary' else top
+
+
+class FontePostgres(_Fonte):
+    """Lê os agregados gravados pelo job; cada tabela é consultada só quando a página a usa."""
+
+    def __init__(self, engine, empresa, ano, atualizacao=None):
+        self.engine, self.empresa, self.ano = engine, empresa, ano
+        self.atualizacao = atualizacao
+        self._tabelas = {}
+
+    def versao(self):
+        return ('postgres', self.empresa, self.ano, str(self.atualizacao))
+
+    def dre(self):
+        if 'dre' not in self._tabelas:
+            self._tabelas['dre'] = dre_largo(self._tabela('dre_monthly'))
+        return self._tabelas['dre']
+
+    def _tabela(self, nome):
+        if nome not in self._tabelas:
+            self._tabelas[nome] = ler(self.engine, self.empresa, self.ano, nome)
+        return self._tabelas[nome]
+
+
+def cache_info():
+    return _cache.info()
+
+
+def fonte_agregados(engine=None, dataset=None):
+    """Fonte materializada do conjunto quando está em dia; senão cálculo direto das planilhas."""
+    dataset = resolver(dataset)
+    if engine is not None and FONTE != 'planilhas':
+        try:
+            if em_dia(engine, dataset):
+                return FontePostgres(engine, dataset.empresa, dataset.ano,
+                                     atualizado_em(engine, dataset.empresa, dataset.ano))
+        except SQLAlchemyError:
+            pass  # tabelas ainda não criadas (job nunca rodou) ou sem source_signature
+    return FontePlanilhas(dataset)
+
+
+def _engine(url=None):
+    # Sem URL explícita usa a mesma seção [postgres] do secrets.toml do portal
+    from sqlalchemy import create_engine
+
+    url = url or os.environ.get('DRE_DATABASE_URL')
+    if url:
+        return create_engine(url)
+    import tomllib
+
+    portal = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'meu_portal')
+    secrets = os.environ.get('PORTAL_SECRETS', os.path.join(portal, '.streamlit', 'secrets.toml'))
+    with open(secrets, 'rb') as f:
+        config = tomllib.load(f)['postgres']
+    sys.path.insert(0, portal)
+    from db import make_engine
+    return make_engine(config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materializa os agregados da DRE no Postgres.')
+    parser.add_argument('--empresa', help='empresa do registro (padrão: todos os conjuntos registrados)')
+    parser.add_argument('--ano', type=int)
+    parser.add_argument('--pasta', help='pasta fora do registro (usa --empresa/--ano como rótulo)')
+    parser.add_argument('--top', type=int, default=TOP_N, help='tamanho dos rankings')
+    parser.add_argument('--database-url', help='URL SQLAlchemy (padrão: DRE_DATABASE_URL ou secrets.toml do portal)')
+    args = parser.parse_args()
+
+    if args.pasta:
+        conjuntos = [Dataset.da_pasta(args.pasta, args.empresa or EMPRESA_PADRAO, args.ano or ANO_PADRAO)]
+    elif args.empresa:
+        conjuntos = [obter(args.empresa, args.ano)]
+    else:
+        conjuntos = listar()
+
+    engine = _engine(args.database_url)
+    for ds in conjuntos:
+        assinatura = assinatura_planilhas(ds)
+        agregados = calcular(ds, args.top)
+        gravar(engine, ds.empresa, ds.ano, agregados, assinatura)
+        linhas = sum(len(df) for df in agregados.values())
+        print(f'{linhas} linhas gravadas para {ds.empresa}/{ds.ano}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Aquecimento dos caches: recalcula tudo assim que chegam planilhas novas, antes dos usuários.
+
+Sem isto o primeiro usuário depois de uma troca de planilhas (ou de um restart do
+worker) pagava a leitura do Excel e todo o cálculo. `iniciar(engine)` sobe uma thread
+daemon (uma por processo) que, a cada DRE_AQUECIMENTO_INTERVALO segundos (padrão 30),
+compara mtime/tamanho das planilhas de todos os conjuntos registrados e do próprio
+registro (e a data de atualização dos agregados no Postgres, com engine). Na partida e
+a cada mudança, para cada empresa/ano:
+- recarrega os frames preparados (e regrava os snapshots);
+- monta a DRE, os KPIs e os rankings de todos os meses e do ano, e a base das simulações;
+- monta as figuras de todas as páginas para todos os filtros de mês, com a mesma fonte
+  que as páginas vão usar.
+
+Cada rodada fica em `relatorio()` (duração por conjunto e taxa de acerto de cada cache
+desde a partida do processo), aparece no painel de debug do portal e vai para o logger
+"dre.aquecimento". DRE_AQUECIMENTO=0 desliga a thread.
+
+A thread do portal só aquece caches do processo: regravar os agregados no Postgres
+(DDL, DELETE+INSERT) fica com o job, que roda uma vez só, em vez de cada worker do
+Streamlit disputar as mesmas linhas com o papel de banco do portal.
+DRE_AQUECIMENTO_MATERIALIZAR=1 liga a regravação também na thread (um worker só).
+
+Como job (o cache em memória morre com o processo, então serve para os snapshots em
+disco e, com --database-url, para regravar os agregados do Postgres que ficaram para
+trás das planilhas, ver agregados.em_dia):
+
+    python dre/aquecimento.py [--watch] [--intervalo N] [--database-url URL]
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import agregados
+import cenarios
+import dados
+import datasets
+import graficos
+import kpis
+from instrumentacao import etapa
+from motor_dre import ANUAL, MESES_IDX
+
+ATIVO = os.environ.get('DRE_AQUECIMENTO', '1') == '1'
+INTERVALO = float(os.environ.get('DRE_AQUECIMENTO_INTERVALO', 30))
+MATERIALIZAR = os.environ.get('DRE_AQUECIMENTO_MATERIALIZAR') == '1'
+# Segundos sem mudança na assinatura antes de recalcular (cópia em andamento)
+ESTABILIZACAO = 2.0
+
+PERIODOS = [ANUAL] + MESES_IDX
+TOP_N = 5  # tamanho dos rankings das páginas
+
+CACHES = {'dados': dados.cache_info, 'kpis': kpis.cache_info, 'agregados': agregados.cache_info,
+          'cenarios': cenarios.cache_info, 'graficos': graficos.cache_info}
+
+logger = logging.getLogger('dre.aquecimento')
+
+_lock = threading.Lock()
+_thread = None
+_relatorio = {}
+
+
+def _fingerprint(path):
+    try:
+        return dados.fingerprint(path)
+    except OSError:
+        return (path, None, None)
+
+
+def assinatura(engine=None):
+    """Muda quando qualquer planilha, o registro ou os agregados materializados mudam."""
+    partes = [_fingerprint(datasets.REGISTRO)]
+    for ds in datasets.listar():
+        partes += [_fingerprint(ds.caminho(tipo)) for tipo, _ in ds.arquivos]
+        if engine is not None:
+            try:
+                partes.append(str(agregados.atualizado_em(engine, ds.empresa, ds.ano)))
+            except SQLAlchemyError:
+                pass  # tabelas ainda não criadas
+    return tuple(partes)
+
+
+def _contadores():
+    return {nome: info() for nome, info in CACHES.items()}
+
+
+def _taxa(hits, misses):
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+def regravar_agregados(engine, ds):
+    """Regrava os agregados de `ds` no Postgres se as planilhas mudaram desde a última gravação."""
+    try:
+        if agregados.em_dia(engine, ds):
+            return False
+    except SQLAlchemyError:
+        pass  # tabelas ainda não criadas ou sem source_signature: gravar cria
+    assinatura = agregados.assinatura_planilhas(ds)
+    agregados.gravar(engine, ds.empresa, ds.ano, agregados.calcular(ds), assinatura)
+    logger.info('agregados de %s/%s regravados no Postgres', ds.empresa, ds.ano)
+    return True
+
+
+def aquecer_conjunto(ds, engine=None, figuras=True, materializar=MATERIALIZAR):
+    """Frames, DRE, KPIs, rankings e figuras do conjunto; com `materializar`, também os agregados.
+
+    Devolve {'materializado': regravou no Postgres?, 'figuras': nº de figuras}.
+    """
+    dados.carregar_contas(ds)
+    dados.carregar_faturamento(ds)
+    cenarios.base(ds)
+    # A FontePostgres guarda as tabelas só na instância (uma por página): não há o que
+    # aquecer nela, só nos caches das planilhas
+    planilhas = agregados.FontePlanilhas(ds)
+    planilhas.dre()
+    for mes in PERIODOS:
+        planilhas.kpis(mes)
+        planilhas.top_centros(mes, TOP_N)
+        planilhas.resumo_faturamento(mes)
+    resultado = {'materializado': False, 'figuras': 0}
+    if materializar and engine is not None and agregados.FONTE != 'planilhas':
+        resultado['materializado'] = regravar_agregados(engine, ds)
+    if not figuras:
+        return resultado
+    import dash_dre_v2 as paginas  # importado aqui: puxa o Streamlit
+
+    fonte = agregados.fonte_agregados(engine, ds)  # a que as páginas vão usar
+    # Mesmas chaves que as páginas pedem (ver dash_dre_v2.figura_*)
+    paginas.figura_dashboard(fonte, datetime.today().month - 1)
+    paginas.figura_evolucao_faturamento(fonte)
+    paginas.figura_dre_completo(fonte)
+    for mes in PERIODOS:
+        for dimensao in paginas.TOPS_FATURAMENTO:
+            paginas.figura_top_faturamento(fonte, mes, dimensao)
+    resultado['figuras'] = 3 + len(PERIODOS) * len(paginas.TOPS_FATURAMENTO)
+    return resultado
+
+
+def aquecer(engine=None, conjuntos=None, figuras=True, materializar=MATERIALIZAR):
+    """Uma rodada de aquecimento; devolve (e guarda em relatorio()) duração e acertos dos caches."""
+    conjuntos = datasets.listar() if conjuntos is None else conjuntos
+    # Mais antigos primeiro: se não couber tudo nos caches, ficam os anos recentes
+    conjuntos = sorted(conjuntos, key=lambda d: d.ano)
+    antes = _contadores()
+    inicio = time.perf_counter()
+    resultado = {'inicio': datetime.now().isoformat(timespec='seconds'), 'conjuntos': []}
+    with etapa('aquecimento', linhas=len(conjuntos)):
+        for ds in conjuntos:
+            t0 = time.perf_counter()
+            item = {'empresa': ds.empresa, 'ano': ds.ano}
+            try:
+                item.update(aquecer_conjunto(ds, engine, figuras, materializar))
+            except Exception as e:  # planilha faltando/corrompida: segue com os outros conjuntos
+                item['erro'] = f'{type(e).__name__}: {e}'
+                logger.warning('aquecimento de %s/%s falhou: %s', ds.empresa, ds.ano, item['erro'])
+            item['segundos'] = round(time.perf_counter() - t0, 3)
+            resultado['conjuntos'].append(item)
+    resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+
+    depois = _contadores()
+    resultado['caches'] = {}
+    for nome, info in depois.items():
+        rodada_hits = info['hits'] - antes[nome]['hits']
+        rodada_misses = info['misses'] - antes[nome]['misses']
+        resultado['caches'][nome] = {
+            'entradas': info['entries'],
+            'taxa_acerto': _taxa(info['hits'], info['misses']),  # desde a partida do processo
+            'montados_na_rodada': rodada_misses,
+            'ja_em_cache_na_rodada': rodada_hits,
+        }
+    with _lock:
+        _relatorio.clear()
+        _relatorio.update(resultado)
+    logger.info('aquecimento em %.2fs: %s', resultado['segundos'],
+                {n: c['taxa_acerto'] for n, c in resultado['caches'].items()})
+    return resultado
+
+
+def relatorio():
+    """Última rodada, com a taxa de acerto atual de cada cache (inclui os acessos das páginas)."""
+    with _lock:
+        ultimo = dict(_relatorio)
+    if ultimo:
+        ultimo['caches'] = {nome: {**ultimo['caches'][nome],
+                                   'taxa_acerto': _taxa(info['hits'], info['misses'])}
+                            for nome, info in _contadores().items()}
+    return ultimo
+
+
+def vigiar(engine=None, intervalo=INTERVALO, parar=None):
+    """Aquece agora e de novo a cada mudança nas planilhas; roda até `parar` (threading.Event)."""
+    parar = parar or threading.Event()
+    atual = None
+    while not parar.is_set():
+        try:
+            nova = assinatura(engine)
+            if nova != atual:
+                if atual is not None:
+                    # Planilha ainda sendo copiada: espera a assinatura parar de mudar
+                    parar.wait(ESTABILIZACAO)
+                    if assinatura(engine) != nova:
+                        continue
+                aquecer(engine)
+                atual = nova
+        except Exception:
+            logger.exception('falha no aquecimento dos caches')
+        parar.wait(intervalo)
+
+
+def iniciar(engine=None, intervalo=INTERVALO):
+    """Sobe (uma vez por processo) a thread daemon que vigia as planilhas e aquece os caches."""
+    global _thread
+    if not ATIVO:
+        return None
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=vigiar, args=(engine, intervalo), daemon=True,
+                                       name='dre-aquecimento')
+            _thread.start()
+    return _thread
+
+
+def _imprimir(resultado):
+    for item in resultado['conjuntos']:
+        situacao = item.get('erro') or ('agregados regravados' if item.get('materializado') else 'ok')
+        print(f"{item['empresa']}/{item['ano']}: {item['segundos']:.2f}s ({situacao})")
+    for nome, c in resultado['caches'].items():
+        taxa = '-' if c['taxa_acerto'] is None else f"{c['taxa_acerto']:.0%}"
+        print(f"  cache {nome}: {c['entradas']} entradas, {c['montados_na_rodada']} montadas, "
+              f"{c['ja_em_cache_na_rodada']} já em cache, acerto {taxa}")
+    print(f"aquecimento em {resultado['segundos']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pré-calcula a DRE de todos os conjuntos registrados.')
+    parser.add_argument('--watch', action='store_true', help='continua vigiando as planilhas')
+    parser.add_argument('--intervalo', type=float, default=INTERVALO, help='segundos entre verificações')
+    parser.add_argument('--database-url', help='também regrava no Postgres os agregados desatualizados (ver agregados.py)')
+    args = parser.parse_args()
+
+    engine = agregados._engine(args.database_url) if args.database_url else None
+    atual = None
+    while True:
+        nova = assinatura()
+        if nova != atual:
+            _imprimir(aquecer(engine, figuras=False, materializar=True))  # figuras só valem no processo do portal
+            atual = nova
+        if not args.watch:
+            break
+        try:
+            time.sleep(args.intervalo)
+        except KeyboardInterrupt:
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark headless (sem Streamlit) das etapas da DRE sobre dados sintéticos.
+
+Uso: python dre/benchmark.py --linhas 10000 100000 1000000 [--excel-ate 100000]
+
+Cada execução acrescenta uma linha JSON por (linhas, etapa) em --saida, para
+acompanhar regressões entre commits.
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from dados import (montar_contas_a_pagar, montar_contas_a_receber, preparar_contas_a_pagar,
+                   preparar_contas_a_receber)
+from datasets import Dataset
+from gerar_dados_sinteticos import (gerar_classificacao, gerar_contas_a_pagar,
+                                    gerar_contas_a_receber, gerar_planilhas)
+from motor_dre import calcular_dre
+
+SAIDA_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results.jsonl')
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def cronometrar(fn, repeticoes):
+    """Melhor tempo (s) de `repeticoes` execuções e o último resultado."""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = fn()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def medir(linhas, repeticoes=3, excel=False):
+    """Tempos por etapa para um volume de lançamentos."""
+    tempos = {}
+    cpa_raw = gerar_contas_a_pagar(linhas)
+    cre_raw = gerar_contas_a_receber(linhas)
+    classif_df, map_df = gerar_classificacao()
+
+    if excel:
+        with tempfile.TemporaryDirectory() as pasta:
+            gerar_planilhas(pasta, linhas)
+            ds = Dataset.da_pasta(pasta)
+            tempos['load'], _ = cronometrar(lambda: (
+                preparar_contas_a_pagar(ds.caminho('apagar'), ds.caminho('classif')),
+                preparar_contas_a_receber(ds.caminho('areceber')),
+            ), 1)
+
+    tempos['prepare'], (cpa, cre) = cronometrar(lambda: (
+        montar_contas_a_pagar(cpa_raw, classif_df, map_df),
+        montar_contas_a_receber(cre_raw),
+    ), repeticoes)
+    tempos['kpis'], _ = cronometrar(lambda: calcular_dre(cpa, cre, excluir_transferencias=True), repeticoes)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--excel-ate', type=int, default=100_000,
+                        help='mede a leitura do Excel só até esse volume (gravar/ler xlsx é lento)')
+    parser.add_argument('--saida', default=SAIDA_PADRAO)
+    args = parser.parse_args()
+
+    commit = _commit()
+    with open(args.saida, 'a', encoding='utf-8') as saida:
+        for linhas in args.linhas:
+            tempos = medir(linhas, args.repeticoes, excel=linhas <= args.excel_ate)
+            for etapa, segundos in tempos.items():
+                print(f'{linhas:>10} linhas  {etapa:<8} {segundos * 1000:10.1f} ms')
+                saida.write(json.dumps({
+                    'timestamp': datetime.now().isoformat(timespec='seconds'),
+                    'commit': commit,
+                    'linhas': linhas,
+                    'etapa': etapa,
+                    'segundos': segundos,
+                    'repeticoes': 1 if etapa == 'load' else args.repeticoes,
+                }) + '\n')
+
+
+if __name__ == '__main__':
+    main()
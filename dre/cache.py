@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cache LRU thread-safe, compartilhado por todas as sessões do processo.
+
+    Com `max_bytes`, também limita a soma de `tamanho(valor)` das entradas; a entrada
+    recém-montada nunca é descartada, mesmo sozinha acima do limite.
+    """
+
+    def __init__(self, max_entries, max_bytes=None, tamanho=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._tamanho = tamanho
+        self._dados = OrderedDict()
+        self._bytes = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._dados:
+                self._dados.move_to_end(key)
+                self.hits += 1
+                return self._dados[key]
+            self.misses += 1
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # Só uma sessão monta cada chave; as outras esperam e reaproveitam
+        with build_lock:
+            with self._lock:
+                if key in self._dados:
+                    self._dados.move_to_end(key)
+                    return self._dados[key]
+            value = build()
+            tamanho = self._tamanho(value) if self._tamanho else 0
+            with self._lock:
+                self._inserir(key, value, tamanho)
+                self._build_locks.pop(key, None)
+        return value
+
+    def get(self, key, default=None):
+        """Valor guardado (sem montar); não conta como acerto nem falta."""
+        with self._lock:
+            if key not in self._dados:
+                return default
+            self._dados.move_to_end(key)
+            return self._dados[key]
+
+    def put(self, key, value):
+        """Guarda (ou troca) o valor de `key`, com o mesmo descarte do get_or_build."""
+        tamanho = self._tamanho(value) if self._tamanho else 0
+        with self._lock:
+            self._inserir(key, value, tamanho)
+
+    def _inserir(self, key, value, tamanho):
+        self._dados[key] = value
+        self._bytes[key] = tamanho
+        self._dados.move_to_end(key)
+        while len(self._dados) > 1 and (len(self._dados) > self.max_entries or self._excede_bytes()):
+            antiga, _ = self._dados.popitem(last=False)
+            self._bytes.pop(antiga, None)
+
+    def _excede_bytes(self):
+        return self.max_bytes is not None and sum(self._bytes.values()) > self.max_bytes
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+            self._bytes.clear()
+
+    def info(self):
+        with self._lock:
+            info = {'entries': len(self._dados), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+            if self.max_bytes is not None:
+                info.update(bytes=sum(self._bytes.values()), max_bytes=self.max_bytes)
+            return info
@@ -0,0 +1,175 @@
+"""Simulação de cenários (what-if) sobre os agregados mensais da DRE.
+
+As premissas fixas da DRE (rateio da folha 60/40 entre variável e fixo) e as variações
+de receita, preço e custo por Grupo viram parâmetros. Cada cenário é uma posição nos
+arrays de parâmetros e todos são avaliados de uma vez com operações NumPy (einsum +
+motor_dre.linhas_dre), sem voltar aos lançamentos. A base (somas por mês x Grupo x
+marcação da DRE) é montada uma vez por versão das planilhas.
+
+Efeito de cada parâmetro (variações em %):
+- volume: receita, deduções, custos variáveis (com a parte variável da folha) e impostos;
+- preco: receita, deduções e impostos; os custos não mudam;
+- custos por Grupo: todos os lançamentos de contas a pagar do Grupo (antes do volume);
+- folha_perc_var: fração da folha tratada como custo variável (o resto vai para o fixo).
+
+Transferências entre contas ficam fora, como em kpis.dre_mensal.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from cache import CacheLRU
+from classificacao import FLAGS, combinacoes, regras_dre
+from dados import carregar_contas, versao_contas
+from datasets import resolver
+from instrumentacao import etapa
+from motor_dre import ANUAL, FOLHA_PERC_VAR, MESES_IDX, linhas_dre, rateio_folha, somas_mensais
+
+MARCACOES = [f for f in FLAGS if f != 'transferencia']
+SEM_GRUPO = '(sem grupo)'
+
+# Indicadores devolvidos por simular/grade
+RESULTADOS = ['Receita Líquida', 'Lucro Líquido', 'Ponto de Equilíbrio',
+              'Margem de Contribuição', 'Margem Líquida']
+
+_cache = CacheLRU(8)
+
+
+@dataclass(frozen=True, eq=False)
+class Base:
+    """Agregados de um conjunto; o índice 0 dos meses guarda os lançamentos sem data."""
+    grupos: tuple         # nomes dos Grupos (eixo 1 de `custos`)
+    custos: np.ndarray    # (13 meses, grupos, MARCACOES)
+    receita: np.ndarray   # (13,)
+    deducoes: np.ndarray  # (13,)
+
+
+@dataclass(frozen=True)
+class Cenario:
+    nome: str = 'Base'
+    folha_perc_var: float = FOLHA_PERC_VAR
+    volume: float = 0.0
+    preco: float = 0.0
+    custos: tuple = field(default=())  # ((Grupo, variação %), ...)
+
+
+# ───────────────────────────── base ─────────────────────────────
+
+def montar_base(cpa, cre):
+    """Somas de contas a pagar por (mês, Grupo, marcação) e receita/deduções por mês."""
+    codigos, tabela = combinacoes(cpa)
+    flags = regras_dre(tabela)
+    flags.loc[flags['transferencia']] = False
+    marcas = flags[MARCACOES].to_numpy(dtype=float)
+
+    n = len(tabela)
+    chave = cpa['Mes'].to_numpy().astype(np.int64) * n + codigos
+    por_combinacao = np.bincount(chave, weights=cpa['Valor'].fillna(0.0).to_numpy(),
+                                 minlength=13 * n).reshape(13, n)
+    codigo_grupo, grupos = pd.factorize(tabela['Grupo'].astype(object).fillna(SEM_GRUPO), sort=True)
+    grupo = np.zeros((n, len(grupos)))
+    grupo[np.arange(n), codigo_grupo] = 1.0
+    custos = np.einsum('mn,ng,nf->mgf', por_combinacao, grupo, marcas)
+
+    somas = somas_mensais(cpa, cre, excluir_transferencias=True)
+    return Base(tuple(grupos), custos, somas['receita'].to_numpy(), somas['deducoes'].to_numpy())
+
+
+def base(dataset=None):
+    """Base do conjunto, montada uma vez por versão das planilhas."""
+    dataset = resolver(dataset)
+
+    def build():
+        cpa, cre = carregar_contas(dataset)
+        return montar_base(cpa, cre)
+
+    return _cache.get_or_build(('base', versao_contas(dataset)), build)
+
+
+# ───────────────────────────── avaliação vetorizada ─────────────────────────────
+
+def avaliar(base, folha_perc_var, volume, preco, fatores_custo):
+    """DRE de S cenários: arrays (S,) de parâmetros e (S, grupos) de fatores de custo.
+
+    Devolve as colunas de DRE_COLUNAS (mais 'Margem Líquida') como arrays (S, 13),
+    coluna 0 = ANUAL e 1-12 = meses, como o índice de kpis.dre_mensal.
+    """
+    folha_perc_var = np.asarray(folha_perc_var, dtype=float)[:, None]
+    volume = 1 + np.asarray(volume, dtype=float)[:, None] / 100
+    preco = 1 + np.asarray(preco, dtype=float)[:, None] / 100
+
+    # (marcação, cenário, mês)
+    c = dict(zip(MARCACOES, np.einsum('sg,mgf->fsm', np.asarray(fatores_custo, dtype=float), base.custos)))
+    desp_var, desp_fix = rateio_folha(c['variavel'], c['fixo'], c['folha'], folha_perc_var)
+    totais = {
+        'receita': base.receita * volume * preco,
+        'deducoes': base.deducoes * volume * preco,
+        'variaveis': desp_var * volume,
+        'fixos': desp_fix,
+        'impostos': (c['imposto'] + c['simples']) * volume * preco,
+        'financeiras': c['financeiras'],
+    }
+    # ANUAL (soma, com os lançamentos sem data) na coluna 0, meses 1-12 depois
+    for nome, valores in totais.items():
+        totais[nome] = np.concatenate([valores.sum(axis=1, keepdims=True), valores[:, 1:]], axis=1)
+
+    dre = linhas_dre(totais['receita'], totais['deducoes'], totais['variaveis'], totais['fixos'],
+                     totais['impostos'], totais['financeiras'])
+    receita_liquida = dre['Receita Líquida']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dre['Margem Líquida'] = np.where(receita_liquida != 0, dre['Lucro Líquido'] / receita_liquida * 100, 0.0)
+    return dre
+
+
+def _fatores(base, custos_por_cenario):
+    indice = {g: i for i, g in enumerate(base.grupos)}
+    fatores = np.ones((len(custos_por_cenario), len(base.grupos)))
+    for s, custos in enumerate(custos_por_cenario):
+        for grupo, variacao in custos:
+            if grupo not in indice:
+                raise KeyError(f'Grupo desconhecido: {grupo}')
+            fatores[s, indice[grupo]] = 1 + variacao / 100
+    return fatores
+
+
+def _resultados(dre, periodo):
+    coluna = [ANUAL] + MESES_IDX
+    return pd.DataFrame({nome: dre[nome][:, coluna.index(periodo)] for nome in RESULTADOS})
+
+
+def simular(base, cenarios, periodo=ANUAL):
+    """Indicadores do período para cada Cenario (uma linha por cenário, índice = nome)."""
+    cenarios = list(cenarios)
+    with etapa('simulacao', linhas=len(cenarios)):
+        dre = avaliar(base,
+                      [c.folha_perc_var for c in cenarios],
+                      [c.volume for c in cenarios],
+                      [c.preco for c in cenarios],
+                      _fatores(base, [c.custos for c in cenarios]))
+        resultado = _resultados(dre, periodo)
+    resultado.index = pd.Index([c.nome for c in cenarios], name='Cenário')
+    return resultado
+
+
+def grade(base, periodo=ANUAL, folha_perc_var=(FOLHA_PERC_VAR,), volume=(0.0,), preco=(0.0,), custos=None):
+    """Todas as combinações dos valores dados (produto cartesiano), avaliadas de uma vez.
+
+    `custos` = {Grupo: [variações %]}. Devolve os parâmetros de cada cenário e os RESULTADOS.
+    """
+    custos = custos or {}
+    eixos = {'folha_perc_var': folha_perc_var, 'volume': volume, 'preco': preco,
+             **{f'custo:{g}': v for g, v in custos.items()}}
+    malha = np.meshgrid(*[np.asarray(v, dtype=float) for v in eixos.values()], indexing='ij')
+    parametros = pd.DataFrame({nome: m.ravel() for nome, m in zip(eixos, malha)})
+
+    fatores = np.ones((len(parametros), len(base.grupos)))
+    for grupo in custos:
+        fatores[:, base.grupos.index(grupo)] = 1 + parametros[f'custo:{grupo}'].to_numpy() / 100
+    with etapa('simulacao', linhas=len(parametros)):
+        dre = avaliar(base, parametros['folha_perc_var'], parametros['volume'], parametros['preco'], fatores)
+        return pd.concat([parametros, _resultados(dre, periodo)], axis=1)
+
+
+def cache_info():
+    return _cache.info()
@@ -0,0 +1,150 @@
+"""Índice de classificação: categoria -> conta padrão -> linha da DRE.
+
+O número de categorias distintas é minúsculo perto do número de lançamentos, então
+limpeza do código, de-para de contas, classificação fixo/variável e regras da DRE
+são avaliados uma vez por valor distinto e espalhados pelas linhas via códigos.
+
+Auditoria: `python dre/classificacao.py [--csv arquivo.csv]` lista o índice atual.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from cache import CacheLRU
+
+# Regras da DRE sobre a conta padrão e o grupo (comparação sem diferenciar maiúsculas)
+CONTA_TRANSFERENCIA = 'transferência entre contas'
+CONTA_SIMPLES = 'simples nacional'
+GRUPO_FOLHA = 'despesas com folha'
+GRUPO_FINANCEIRAS = 'despesas financeiras'
+GRUPO_IMPOSTO = 'imposto'
+GRUPOS_FORA_CUSTO = [GRUPO_IMPOSTO, GRUPO_FINANCEIRAS]
+
+FLAGS = ['transferencia', 'folha', 'variavel', 'fixo', 'financeiras', 'imposto', 'simples']
+
+_cache = CacheLRU(16)
+
+
+def _distintos(serie):
+    """Códigos por linha e os valores distintos, com o ausente (código -1) como último valor."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, distintos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, distintos = pd.factorize(serie)
+    return codigos, pd.Series(list(distintos) + [np.nan], dtype=object)
+
+
+def mapear_categorias(categorias, classif_df, map_df):
+    """Para cada categoria distinta: CategoriaLimpa, contasnovas, ContaPadrao e colunas da classificação."""
+    tabela = pd.DataFrame({'Categoria': categorias})
+    tabela['CategoriaLimpa'] = categorias.astype(str).str.replace(r'^\d+\s*', '', regex=True)
+    de_para = map_df.drop_duplicates('contasantigas').rename(columns={'contasantigas': 'CategoriaLimpa'})
+    tabela = tabela.merge(de_para, on='CategoriaLimpa', how='left')
+    tabela['ContaPadrao'] = tabela['contasnovas'].combine_first(tabela['CategoriaLimpa'])
+    classif = classif_df.drop_duplicates('Conta').rename(columns={'Conta': 'ContaPadrao'})
+    return tabela.merge(classif, on='ContaPadrao', how='left')
+
+
+def aplicar_categorias(df, classif_df, map_df):
+    """Acrescenta ao frame as colunas do de-para/classificação sem regex nem merge por linha."""
+    codigos, categorias = _distintos(df['Categoria'])
+    tabela = mapear_categorias(categorias, classif_df, map_df)
+    df = df.copy()
+    for col in tabela.columns.drop('Categoria'):
+        valores = pd.Categorical(tabela[col])
+        df[col] = pd.Categorical.from_codes(valores.codes[codigos], dtype=valores.dtype)
+    return df
+
+
+def _lower(serie):
+    return serie.astype(object).where(serie.notna()).str.lower()
+
+
+def regras_dre(tabela):
+    """Marcações da DRE para cada combinação distinta de ContaPadrao, Grupo e Classificação.
+
+    As marcações não são exclusivas (ex.: Simples Nacional no grupo Imposto entra nas duas),
+    exatamente como as regras originais das páginas.
+    """
+    conta = _lower(tabela['ContaPadrao'])
+    grupo = _lower(tabela['Grupo'])
+    classif = _lower(tabela['Classificação'])
+    custo = ~grupo.isin(GRUPOS_FORA_CUSTO)
+
+    flags = pd.DataFrame({
+        'transferencia': conta.str.contains(CONTA_TRANSFERENCIA, regex=False, na=False),
+        'folha': grupo == GRUPO_FOLHA,
+        'variavel': (classif == 'variável') & custo,
+        'fixo': (classif == 'fixo') & custo,
+        'financeiras': grupo == GRUPO_FINANCEIRAS,
+        'imposto': grupo == GRUPO_IMPOSTO,
+        'simples': conta.str.contains(CONTA_SIMPLES, regex=False, na=False),
+    }, index=tabela.index)
+    return flags
+
+
+def linha_dre(flags):
+    """Rótulo principal de cada combinação, só para auditoria (os valores usam as marcações)."""
+    rotulos = [
+        ('transferencia', 'Transferência (fora da DRE)'),
+        ('imposto', 'Impostos'),
+        ('simples', 'Impostos'),
+        ('financeiras', 'Despesas Financeiras'),
+        ('folha', 'Folha (60% variável / 40% fixo)'),
+        ('variavel', 'Custos Variáveis'),
+        ('fixo', 'Custos Fixos'),
+    ]
+    linha = pd.Series('Sem classificação', index=flags.index, dtype=object)
+    for flag, rotulo in reversed(rotulos):
+        linha[flags[flag]] = rotulo
+    return linha
+
+
+def combinacoes(cpa):
+    """Código por linha da combinação (ContaPadrao, Grupo, Classificação) e a tabela de combinações."""
+    chaves = ['ContaPadrao', 'Grupo', 'Classificação']
+    grupos = cpa.groupby(chaves, observed=True, dropna=False)
+    codigos = grupos.ngroup().to_numpy()
+    tabela = grupos.size().reset_index(name='linhas')[chaves + ['linhas']]
+    return codigos, tabela
+
+
+def indice_classificacao(dataset=None):
+    """Tabela auditável: cada combinação de conta/grupo/classificação, suas marcações e totais.
+
+    Cacheada pela versão das planilhas (inclui a de classificação).
+    """
+    from dados import carregar_contas, versao_contas
+
+    def build():
+        cpa, _ = carregar_contas(dataset)
+        codigos, tabela = combinacoes(cpa)
+        flags = regras_dre(tabela)
+        tabela = pd.concat([tabela, flags], axis=1)
+        tabela['LinhaDRE'] = linha_dre(flags)
+        tabela['Valor'] = np.bincount(codigos, weights=cpa['Valor'].fillna(0).to_numpy(),
+                                      minlength=len(tabela))
+        categorias = (cpa.groupby('ContaPadrao', observed=True)['Categoria']
+                      .agg(lambda s: ', '.join(sorted(map(str, s.dropna().unique())))))
+        tabela['Categorias'] = tabela['ContaPadrao'].map(categorias)
+        return tabela.sort_values(['LinhaDRE', 'ContaPadrao']).reset_index(drop=True)
+
+    return _cache.get_or_build(('indice', versao_contas(dataset)), build)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lista o índice de classificação da DRE.')
+    parser.add_argument('pasta', nargs='?', help='pasta das planilhas (padrão: primeiro conjunto registrado)')
+    parser.add_argument('--csv', help='grava o índice em CSV em vez de imprimir')
+    args = parser.parse_args()
+    indice = indice_classificacao(args.pasta)
+    if args.csv:
+        indice.to_csv(args.csv, index=False)
+    else:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(indice)
+
+
+if __name__ == '__main__':
+    main()
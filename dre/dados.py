@@ -0,0 +1,222 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import incremental
+import leitura
+import paralelo
+import snapshot
+from cache import CacheLRU
+from classificacao import aplicar_categorias
+from datasets import SHEETS, resolver
+from instrumentacao import etapa
+
+# Quantos frames preparados (de qualquer empresa/ano) ficam em memória ao mesmo tempo,
+# limitados também pelo tamanho total: os menos usados saem primeiro
+CACHE_MAX_ENTRIES = int(os.environ.get('DRE_CACHE_MAX_ENTRIES', 8))
+CACHE_MAX_MB = int(os.environ.get('DRE_CACHE_MAX_MB', 1024))
+
+
+def _tamanho(valor):
+    return int(valor.memory_usage(deep=True).sum()) if isinstance(valor, pd.DataFrame) else 0
+
+
+_cache = CacheLRU(CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_MB * 2**20, tamanho=_tamanho)
+
+# Caches de outros módulos com estado tirado destes frames (ver registrar_cache)
+_derivados = []
+
+# Carga a frio de contas a pagar e a receber ao mesmo tempo (as abas vão para o pool de processos)
+_cargas = ThreadPoolExecutor(max_workers=2, thread_name_prefix='dre-carga')
+
+
+def fingerprint(path):
+    """Identifica a versão de um arquivo pelo caminho, mtime e tamanho."""
+    info = os.stat(path)
+    return (os.path.abspath(path), info.st_mtime_ns, info.st_size)
+
+
+def versao_contas(dataset=None):
+    """Versão do conjunto contas a pagar/receber + classificação (chave para caches derivados).
+
+    Inclui o conjunto e as abas: empresas que dividem as mesmas planilhas leem abas diferentes.
+    """
+    dataset = resolver(dataset)
+    return (dataset.chave, dataset.abas,
+            *(fingerprint(dataset.caminho(tipo)) for tipo in ('apagar', 'areceber', 'classif')))
+
+
+def registrar_cache(cache):
+    """Inclui `cache` (ex.: estado incremental de kpis.py) no que invalidar_cache descarta."""
+    _derivados.append(cache)
+    return cache
+
+
+def invalidar_cache():
+    """Descarta todos os dados preparados (ex.: após trocar as planilhas)."""
+    _cache.clear()
+    for cache in _derivados:
+        cache.clear()
+
+
+def cache_info():
+    return _cache.info()
+
+
+# Colunas que a DRE usa de cada razão; as demais nem são lidas (ver leitura.py)
+COLUNAS_APAGAR = ['Pagto', 'Categoria', 'Valor', 'Grupo', 'Setor Cons.']
+COLUNAS_ARECEBER = ['Pagto.', 'Categoria', 'Valor']
+
+
+def _ler_planilhas(path, sheets, colunas=None):
+    # Abas em paralelo (ver paralelo.py) e depois concatenadas na ordem pedida
+    with etapa('excel', arquivo=os.path.basename(path), bytes=os.path.getsize(path)) as medida:
+        df = leitura.concatenar(paralelo.ler_abas([(path, sheet) for sheet in sheets], colunas))
+        medida['linhas'] = len(df)
+    return df
+
+
+# Colunas de texto com poucos valores distintos: viram categóricas (códigos inteiros pequenos)
+COLUNAS_CATEGORICAS = ['Categoria', 'CategoriaLimpa', 'ContaPadrao', 'contasnovas',
+                       'Grupo', 'Classificação', 'Setor Cons.']
+
+
+def compactar(df):
+    """Tipos compactos: texto repetido como category, Valor em float64 e mês do pagamento em int8."""
+    for col in COLUNAS_CATEGORICAS:
+        if col in df and pd.api.types.is_string_dtype(df[col].dtype):
+            df[col] = df[col].astype('category')
+    if pd.api.types.is_numeric_dtype(df['Valor']):
+        df['Valor'] = df['Valor'].astype('float64')
+    df['Mes'] = df['DataPagamento'].dt.month.fillna(0).astype('int8')
+    return df
+
+
+def _datas_de_texto(textos):
+    # Células de data numa coluna mista chegam como texto ISO (ver leitura._tipar); o resto é dd/mm/aaaa.
+    # Em separado: o to_datetime deduz um formato só para a lista toda
+    iso = pd.to_datetime(textos, format='ISO8601', errors='coerce')
+    e_iso = np.asarray(iso.notna())
+    if not e_iso.any():
+        return pd.to_datetime(textos, dayfirst=True, errors='coerce')
+    valores = iso.to_numpy().astype('datetime64[us]')
+    valores[~e_iso] = pd.to_datetime(textos[~e_iso], dayfirst=True, errors='coerce').to_numpy()
+    return pd.DatetimeIndex(valores)
+
+
+def _datas(serie):
+    """Pagto (dd/mm/aaaa) em datetime; categórica (leitura em streaming) converte só os valores distintos."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        datas = _datas_de_texto(serie.cat.categories)
+        return pd.Series(datas.take(serie.cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT), index=serie.index)
+    return pd.to_datetime(serie, dayfirst=True, errors='coerce')
+
+
+def montar_contas_a_pagar(cpa_raw, classif_df, map_df):
+    """Datas, categoria limpa, conta padrão e classificação a partir das planilhas já lidas."""
+    with etapa('merge_categorias', linhas=len(cpa_raw)):
+        # de-para e classificação resolvidos por categoria distinta (ver classificacao.py)
+        cpa = aplicar_categorias(cpa_raw, classif_df, map_df)
+        cpa['DataPagamento'] = _datas(cpa['Pagto'])
+    return compactar(cpa)
+
+
+def montar_contas_a_receber(cre_raw):
+    cre = cre_raw.copy()
+    cre['DataPagamento'] = _datas(cre['Pagto.'])
+    return compactar(cre)
+
+
+def _preparar(raw, montar, anterior):
+    if not incremental.ATIVO:
+        return montar(raw)
+    return incremental.mesclar(raw, anterior, montar)
+
+
+def preparar_contas_a_pagar(path_apagar, path_classif, anterior=None, abas=SHEETS):
+    """Lê e prepara contas a pagar; com `anterior` só as linhas novas são preparadas."""
+    cpa_raw = _ler_planilhas(path_apagar, abas, COLUNAS_APAGAR)
+    classif_df, map_df = paralelo.ler_abas([(path_classif, 0), (path_classif, 1)])
+    return _preparar(cpa_raw, lambda raw: montar_contas_a_pagar(raw, classif_df, map_df), anterior)
+
+
+def preparar_contas_a_receber(path_areceber, anterior=None, abas=SHEETS):
+    return _preparar(_ler_planilhas(path_areceber, abas, COLUNAS_ARECEBER), montar_contas_a_receber, anterior)
+
+
+# Colunas de mês da planilha de faturamento (formato largo)
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+
+def faturamento_longo(fat):
+    """Faturamento largo (uma coluna por mês) em formato longo: Venda, Cliente, Vendedor, Mes, Valor.
+
+    Só entram os meses com valor; a venda sem valor em nenhum mês fica com uma linha
+    Mes=0 e Valor=0, para ainda contar nas vendas e clientes do ano.
+    """
+    valores = fat[MESES].to_numpy(dtype='float64')
+    com_valor = np.nan_to_num(valores) != 0
+    vendas, meses = np.nonzero(com_valor)
+    sem_valor = np.flatnonzero(~com_valor.any(axis=1))
+
+    vendas = np.concatenate([vendas, sem_valor])
+    ordem = np.argsort(vendas, kind='stable')  # linhas na ordem da planilha, meses em ordem
+    vendas = vendas[ordem]
+    longo = pd.DataFrame({
+        'Venda': vendas.astype('int32'),
+        'Mes': np.concatenate([meses + 1, np.zeros(len(sem_valor), dtype=meses.dtype)])[ordem].astype('int8'),
+        'Valor': np.concatenate([valores[com_valor], np.zeros(len(sem_valor))])[ordem],
+    })
+    for col in ('Cliente', 'Vendedor'):
+        categorias = pd.Categorical(fat[col].astype(object))
+        longo.insert(len(longo.columns) - 2, col, categorias[vendas])
+    return longo
+
+
+def preparar_faturamento(path_faturamento):
+    fat = _ler_planilhas(path_faturamento, paralelo.abas(path_faturamento))
+    fat.columns = [str(c).strip() for c in fat.columns]
+    return faturamento_longo(fat)
+
+
+def carregar_contas(dataset=None):
+    """Retorna (cpa, cre) preparados do conjunto (empresa, ano), reaproveitando o cache enquanto as planilhas não mudarem.
+
+    Num processo novo os frames vêm do snapshot colunar em disco (ver snapshot.py),
+    só voltando ao Excel quando a assinatura de alguma planilha de origem muda; aí
+    só as linhas novas ou alteradas são preparadas (ver incremental.py).
+
+    Os DataFrames são compartilhados entre sessões: não devem ser alterados in-place.
+    """
+    ds = resolver(dataset)
+    path_apagar = ds.caminho('apagar')
+    path_areceber = ds.caminho('areceber')
+    path_classif = ds.caminho('classif')
+
+    def cre():
+        return _cache.get_or_build(('cre', ds.abas, fingerprint(path_areceber)),
+                                   lambda: snapshot.carregar(f'{ds.chave}-cre', [path_areceber],
+                                                             lambda anterior: preparar_contas_a_receber(
+                                                                 path_areceber, anterior, ds.abas),
+                                                             ds.pasta, incremental=True))
+
+    futuro_cre = _cargas.submit(cre) if paralelo.WORKERS > 1 else None
+    cpa = _cache.get_or_build(('cpa', ds.abas, fingerprint(path_apagar), fingerprint(path_classif)),
+                              lambda: snapshot.carregar(f'{ds.chave}-cpa', [path_apagar, path_classif],
+                                                        lambda anterior: preparar_contas_a_pagar(
+                                                            path_apagar, path_classif, anterior, ds.abas),
+                                                        ds.pasta, incremental=True))
+    return cpa, futuro_cre.result() if futuro_cre else cre()
+
+
+def carregar_faturamento(dataset=None):
+    """Faturamento do conjunto no formato longo (ver faturamento_longo), com cache e snapshot."""
+    ds = resolver(dataset)
+    path_faturamento = ds.caminho('faturamento')
+    return _cache.get_or_build(('fat', fingerprint(path_faturamento)),
+                               lambda: snapshot.carregar(f'{ds.chave}-fat', [path_faturamento],
+                                                         lambda: preparar_faturamento(path_faturamento),
+                                                         ds.pasta))
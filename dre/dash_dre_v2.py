@@ -2,153 +2,92 @@ import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 import os
-
-def format_currency(value):
-    return f"R$ {value:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
-
-def main(engine=None, uid=None, page=None):
+import sys
+
+# Garante que os módulos irmãos (dados.py) sejam encontrados mesmo quando
+# este arquivo é carregado pelo portal via spec_from_file_location
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import cenarios
+import datasets
+import exportacao
+import graficos
+import instrumentacao
+from agregados import fonte_agregados
+from formatacao import moeda, numero
+from instrumentacao import etapa
+from motor_dre import ANUAL, DRE_LINHAS, MESES_IDX
+
+# Nome antigo, mantido para as páginas: aceita um valor ou uma Series/lista inteira
+format_currency = moeda
+
+
+def botoes_exportacao(nome, gerar, chave):
+    """Downloads Excel/CSV; `gerar(formato)` só roda no clique (em outra thread, ver exportacao.py)."""
+    col_xlsx, col_csv, _ = st.columns([1, 1, 4])
+    for col, formato, rotulo in ((col_xlsx, 'xlsx', "⬇️ Excel"), (col_csv, 'csv', "⬇️ CSV")):
+        col.download_button(rotulo, data=lambda formato=formato: gerar(formato), file_name=f"{nome}.{formato}",
+                            mime=exportacao.FORMATOS[formato], key=f"{chave}_{formato}", on_click='ignore')
+
+def main(engine=None, uid=None, page=None, empresa=None, ano=None):
     if engine is None and uid is None:
-        st.set_page_config(page_title='Portal DRE TeutoMaq', layout='wide')
+        st.set_page_config(page_title='Portal DRE', layout='wide')
         # Se rodando standalone (fora do portal), mostra opções na sidebar
+        empresa = st.sidebar.selectbox("Empresa", datasets.empresas())
+        ano = st.sidebar.selectbox("Ano", datasets.anos(empresa))
         page = st.sidebar.selectbox("Selecione a Página", [
             "Dashboard Geral",
             "Análise de Faturamento",
             "DRE Trimestral",
             "DRE Completo",
-            "Relatório Executivo"
+            "Relatório Executivo",
+            "Simulação de Cenários"
         ])
+        instrumentacao.iniciar_render(page)
     elif page is None:
         # Se chamado pelo app.py e não especificaram página, assume default
         page = "Dashboard Geral"
 
+    # Agregados materializados no Postgres quando o job já rodou; senão, das planilhas
+    # Empresa/ano escolhidos no portal; sem escolha, o primeiro conjunto registrado
+    with etapa('fonte'):
+        fonte = fonte_agregados(engine, datasets.obter(empresa, ano) if empresa else None)
+
     # Escolhe qual página renderizar
-    if page == "Dashboard Geral":
-        dashboard_geral()
-    elif page == "Análise de Faturamento":
-        faturamento_page()
-    elif page == "DRE Trimestral":
-        base_path = os.path.join(os.path.dirname(__file__), 'data')
-        path_apagar = f'{base_path}/contasapagar2024.xlsx'
-        path_areceber = f'{base_path}/contasareceber2024.xlsx'
-        path_classif = f'{base_path}/Classificacao_Custos_Variavel_x_Fixo.xlsx'
-
-        xls_ap = pd.ExcelFile(path_apagar)
-        cpa_raw = pd.concat([xls_ap.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-        cpa_raw['DataPagamento'] = pd.to_datetime(cpa_raw['Pagto'], dayfirst=True, errors='coerce')
-
-        classif_df = pd.read_excel(path_classif, sheet_name=0)
-        map_df = pd.read_excel(path_classif, sheet_name=1)
-        cpa_raw['CategoriaLimpa'] = cpa_raw['Categoria'].astype(str).str.replace(r'^\d+\s*', '', regex=True)
-        cpa = cpa_raw.merge(map_df.rename(columns={'contasantigas': 'CategoriaLimpa'}), on='CategoriaLimpa', how='left')
-        cpa['ContaPadrao'] = cpa['contasnovas'].combine_first(cpa['CategoriaLimpa'])
-        cpa = cpa.merge(classif_df.rename(columns={'Conta': 'ContaPadrao'}), on='ContaPadrao', how='left')
-
-        xls_cr = pd.ExcelFile(path_areceber)
-        cre = pd.concat([xls_cr.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-        cre['DataPagamento'] = pd.to_datetime(cre['Pagto.'], dayfirst=True, errors='coerce')
-
-        analise_gastos_page(cpa, cre)
-    elif page == "DRE Completo":
-        dre_completo_page()
-    elif page == "Relatório Executivo":
-        relatorio_executivo_page()
-
-
-
-def dashboard_geral():
+    with etapa(f'pagina:{page}'):
+        if page == "Dashboard Geral":
+            dashboard_geral(fonte)
+        elif page == "Análise de Faturamento":
+            faturamento_page(fonte)
+        elif page == "DRE Trimestral":
+            analise_gastos_page(fonte)
+        elif page == "DRE Completo":
+            dre_completo_page(fonte)
+        elif page == "Relatório Executivo":
+            relatorio_executivo_page(fonte)
+        elif page == "Simulação de Cenários":
+            simulacao_page(fonte)
+
+    if engine is None and uid is None:
+        instrumentacao.painel_sidebar(st)
+
+
+
+def dashboard_geral(fonte):
     st.markdown("<h2 style='font-size:28px;'>Dashboard Geral</h2>", unsafe_allow_html=True)
-    base_path = os.path.join(os.path.dirname(__file__), 'data')
-    path_apagar = f'{base_path}/contasapagar2024.xlsx'
-    path_areceber = f'{base_path}/contasareceber2024.xlsx'
-    path_classif = f'{base_path}/Classificacao_Custos_Variavel_x_Fixo.xlsx'
 
     meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
     col_titulo, col_filtro = st.columns([3, 1])
     with col_filtro:
         mes_sel = st.selectbox("Selecione o Mês:", ["Anual"] + meses, index=0)
 
-    xls_ap = pd.ExcelFile(path_apagar)
-    cpa_raw = pd.concat([xls_ap.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-    cpa_raw['DataPagamento'] = pd.to_datetime(cpa_raw['Pagto'], dayfirst=True, errors='coerce')
-
-    classif_df = pd.read_excel(path_classif, sheet_name=0)
-    map_df = pd.read_excel(path_classif, sheet_name=1)
-    cpa_raw['CategoriaLimpa'] = cpa_raw['Categoria'].astype(str).str.replace(r'^\d+\s*', '', regex=True)
-    cpa = cpa_raw.merge(map_df.rename(columns={'contasantigas': 'CategoriaLimpa'}), on='CategoriaLimpa', how='left')
-    cpa['ContaPadrao'] = cpa['contasnovas'].combine_first(cpa['CategoriaLimpa'])
-    cpa = cpa.merge(classif_df.rename(columns={'Conta': 'ContaPadrao'}), on='ContaPadrao', how='left')
-
-    if mes_sel != "Anual":
-        cpa_filtered = cpa[cpa['DataPagamento'].dt.month == meses.index(mes_sel) + 1]
-    else:
-        cpa_filtered = cpa
-
-    xls_cr = pd.ExcelFile(path_areceber)
-    cre = pd.concat([xls_cr.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-    cre['DataPagamento'] = pd.to_datetime(cre['Pagto.'], dayfirst=True, errors='coerce')
-
-    if mes_sel != "Anual":
-        cre_filtered = cre[cre['DataPagamento'].dt.month == meses.index(mes_sel) + 1]
-    else:
-        cre_filtered = cre
-
-    # Receita Total (apenas valores positivos)
-    receitas_total = cre_filtered[cre_filtered['Valor'] > 0]['Valor'].sum()
-
-    # Deduções: negativos + positivos classificados como desconto/devolução
-    deducoes_neg = abs(cre_filtered[(cre_filtered['Valor'] < 0) &
-                                    (cre_filtered['Categoria'].str.contains('desconto|devolução', case=False, na=False))]['Valor'].sum())
-
-    deducoes_pos = cre_filtered[(cre_filtered['Valor'] > 0) &
-                                (cre_filtered['Categoria'].str.contains('desconto|devolução', case=False, na=False))]['Valor'].sum()
-
-    deducoes = deducoes_neg + deducoes_pos
-
-    # Receita Líquida
-    receita_liquida = receitas_total - deducoes
-
-    # Excluir transferências
-    cpa_no_transf = cpa_filtered[~cpa_filtered['ContaPadrao'].str.contains('transferência entre contas', case=False, na=False)]
-
-    # Folha
-    folha_total = cpa_no_transf[cpa_no_transf['Grupo'].str.lower() == 'despesas com folha']['Valor'].sum()
-    folha_var = folha_total * 0.6
-    folha_fix = folha_total * 0.4
-
-    # Despesas variáveis (sem impostos e financeiras)
-    cpa_desp_var = cpa_no_transf[
-        (cpa_no_transf['Classificação'].str.lower() == 'variável') &
-        (~cpa_no_transf['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))
-    ]
-    desp_var = cpa_desp_var['Valor'].sum() + folha_var
-
-    # Impostos
-    impostos = cpa_no_transf[cpa_no_transf['Grupo'].str.lower() == 'imposto']['Valor'].sum()
-    simples_nacional = cpa_no_transf[cpa_no_transf['ContaPadrao'].str.lower().str.contains('simples nacional', na=False)]['Valor'].sum()
-    total_impostos = impostos + simples_nacional
-
-    # Lucro Bruto já deduzindo impostos antes
-    lucro_bruto = receita_liquida - desp_var - total_impostos
-
-    # Despesas fixas (sem impostos e financeiras)
-    cpa_desp_fix = cpa_no_transf[
-        (cpa_no_transf['Classificação'].str.lower() == 'fixo') &
-        (~cpa_no_transf['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))
-    ]
-    desp_fix = cpa_desp_fix['Valor'].sum() + folha_fix
-
-    # Despesas financeiras
-    despesas_financeiras = cpa_no_transf[cpa_no_transf['Grupo'].str.lower() == 'despesas financeiras']['Valor'].sum()
-
-    # EBITDA e Lucro Líquido
-    ebitda = lucro_bruto - desp_fix
-    gasto_total = desp_var + desp_fix + despesas_financeiras + total_impostos
-    lucro_liquido = receita_liquida - gasto_total
-
-    # Margem de Contribuição corrigida (sobre receita líquida)
-    margem_contribuicao_perc = ((lucro_bruto / receita_liquida) * 100) if receita_liquida else 0
-    ponto_equilibrio = desp_fix / (margem_contribuicao_perc / 100) if margem_contribuicao_perc else 0
+    mes = meses.index(mes_sel) + 1 if mes_sel != "Anual" else ANUAL
 
+    kpis = fonte.kpis(mes)
+    receitas_total = kpis.receita_total
+    gasto_total = kpis.despesas_totais
+    lucro_liquido = kpis.lucro_liquido
+    margem_contribuicao_perc = kpis.margem_contribuicao
+    ponto_equilibrio = kpis.ponto_equilibrio
 
     st.markdown("---")
     # KPIs
@@ -164,81 +103,19 @@ def dashboard_geral():
 
     col_peq1, col_peq2, _, _ = st.columns(4)
     col_peq1.metric("Ponto de Equilíbrio", format_currency(ponto_equilibrio))
-    col_peq2.metric("Receita - PE", f"{(receitas_total - ponto_equilibrio):,.2f}".replace(",", "v").replace(".", ",").replace("v", "."))
+    col_peq2.metric("Receita - PE", numero(receitas_total - ponto_equilibrio))
     # Linha estética após Indicadores Chave
     st.markdown("---")
 
     # Gráfico anual
     st.markdown("### Evolução Mensal de Receita e Lucro Líquido (Anual)")
 
-    lucro_liquido_mensal = []
-    receita_liquida_mensal = []
-
-    for i, mes in enumerate(meses, start=1):
-        cre_mes = cre[cre['DataPagamento'].dt.month == i]
-        cpa_mes = cpa[cpa['DataPagamento'].dt.month == i]
-
-        receita_total = cre_mes[cre_mes['Valor'] > 0]['Valor'].sum()
-        deducoes_neg = abs(cre_mes[(cre_mes['Valor'] < 0) & cre_mes['Categoria'].str.contains('desconto|devolução', case=False, na=False)]['Valor'].sum())
-        deducoes_pos = cre_mes[(cre_mes['Valor'] > 0) & cre_mes['Categoria'].str.contains('desconto|devolução', case=False, na=False)]['Valor'].sum()
-        deducoes = deducoes_neg + deducoes_pos
-        receita_liquida = receita_total - deducoes
-        receita_liquida_mensal.append(receita_liquida)
-
-        folha = cpa_mes[cpa_mes['Grupo'].str.lower() == 'despesas com folha']['Valor'].sum()
-        folha_var = folha * 0.6
-        folha_fix = folha * 0.4
-
-        cpa_var = cpa_mes[(cpa_mes['Classificação'].str.lower() == 'variável') & (~cpa_mes['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]
-        cpa_fix = cpa_mes[(cpa_mes['Classificação'].str.lower() == 'fixo') & (~cpa_mes['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]
-
-        desp_var = cpa_var['Valor'].sum() + folha_var
-        desp_fix = cpa_fix['Valor'].sum() + folha_fix
-
-        despesas_financeiras = cpa_mes[cpa_mes['Grupo'].str.lower() == 'despesas financeiras']['Valor'].sum()
-        impostos = cpa_mes[cpa_mes['Grupo'].str.lower() == 'imposto']['Valor'].sum()
-        simples_nacional = cpa_mes[cpa_mes['ContaPadrao'].str.lower().str.contains('simples nacional', na=False)]['Valor'].sum()
-        total_impostos = impostos + simples_nacional
-
-        lucro_liquido = receita_liquida - (desp_var + desp_fix + despesas_financeiras + total_impostos)
-        lucro_liquido_mensal.append(lucro_liquido)
-
     from datetime import datetime
     mes_atual_index = datetime.today().month - 1  # 0-based
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=meses,
-        y=receita_liquida_mensal,
-        mode='lines+markers+text',
-        name='Receita Líquida',
-        line=dict(color='blue'),
-        text=[f"R$ {v:,.0f}".replace(",", "v").replace(".", ",").replace("v", ".") for v in receita_liquida_mensal],
-        textposition="top center"
-    ))
-    fig.add_trace(go.Scatter(
-        x=meses,
-        y=lucro_liquido_mensal,
-        mode='lines+markers+text',
-        name='Lucro Líquido',
-        line=dict(color='green'),
-        marker=dict(color=['green' if val >= 0 else 'red' for val in lucro_liquido_mensal]),
-        text=[f"R$ {v:,.0f}".replace(",", "v").replace(".", ",").replace("v", ".") for v in lucro_liquido_mensal],
-        textposition="bottom center"
-    ))
-    fig.add_vrect(
-        x0=meses[mes_atual_index], x1=meses[mes_atual_index],
-        line_width=0, fillcolor="gray", opacity=0.2,
-        annotation_text="Mês Atual", annotation_position="top left"
-    )
-    fig.update_layout(
-        template='plotly_dark',
-        height=420,
-        title='Evolução Mensal de Receita Líquida e Lucro Líquido (Anual)',
-        xaxis_title="Mês",
-        yaxis_title="Valor (R$)"
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    with etapa('grafico'):
+        # Figura em cache por versão dos dados (ver graficos.py); o mês atual muda a faixa destacada
+        st.plotly_chart(figura_dashboard(fonte, mes_atual_index), use_container_width=True)
 
     # Linha estética após gráfico
     st.markdown("---")
@@ -246,26 +123,25 @@ def dashboard_geral():
     # Tabela: Top 5 Centros de Custos com Maiores Gastos
     st.markdown("### Top 5 Centros de Custos com Maiores Gastos")
 
-    top5_centros = (
-        cpa_filtered.groupby("Setor Cons.")["Valor"]
-        .sum()
-        .nlargest(5)
-        .reset_index()
-        .rename(columns={"Setor Cons.": "Centro de Custo", "Valor": "Valor (R$)"})
-    )
+    with etapa('tabela'):
+        top5 = fonte.top_centros(mes, 5)
+        top5_centros = pd.DataFrame({"Centro de Custo": top5.index, "Valor (R$)": top5.to_numpy()})
 
-    top5_centros.index = top5_centros.index + 1  # índice começa em 1
-    top5_centros["Valor (R$)"] = top5_centros["Valor (R$)"].apply(format_currency)
+        top5_centros.index = top5_centros.index + 1  # índice começa em 1
+        top5_centros["Valor (R$)"] = format_currency(top5_centros["Valor (R$)"])
 
-    st.dataframe(top5_centros.style.set_properties(**{
-        'text-align': 'left'
-    }), use_container_width=True, hide_index=False)
+        st.dataframe(top5_centros.style.set_properties(**{
+            'text-align': 'left'
+        }), use_container_width=True, hide_index=False)
 
+    if exportacao.tem_lancamentos(fonte):
+        st.markdown("### Lançamentos do Período")
+        botoes_exportacao(f"lancamentos_{fonte.empresa}_{fonte.ano}_{mes_sel}",
+                          lambda formato: exportacao.lancamentos(fonte, mes, formato), "exp_lancamentos")
 
-def faturamento_page():
+
+def faturamento_page(fonte):
     st.markdown("<h2 style='font-size:28px;'>Análise de Faturamento</h2>", unsafe_allow_html=True)
-    base_path = os.path.join(os.path.dirname(__file__), 'data')
-    path_faturamento = f'{base_path}/faturamento2024.xlsx'
     meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho',
              'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
 
@@ -273,27 +149,19 @@ def faturamento_page():
     with col_filtro:
         mes_sel = st.selectbox("Selecione o Mês:", ["Anual"] + meses, index=0)
 
-    xls_fat = pd.ExcelFile(path_faturamento)
-    fat = pd.concat([xls_fat.parse(sheet) for sheet in xls_fat.sheet_names], ignore_index=True)
-    fat.columns = [str(c).strip() for c in fat.columns]
-
-    if mes_sel == "Anual":
-        fat_mes = fat.copy()
-        fat_mes['TotalCliente'] = fat[meses].sum(axis=1)
-    else:
-        fat_mes = fat[fat[mes_sel] > 0].copy()
-        fat_mes['TotalCliente'] = fat_mes[mes_sel]
+    mes = meses.index(mes_sel) + 1 if mes_sel != "Anual" else ANUAL
+    resumo = fonte.resumo_faturamento(mes)
+    top5_vendedores = fonte.top_faturamento(mes, 'vendedor', 5)
+    top5_clientes = fonte.top_faturamento(mes, 'cliente', 5)
 
-    faturamento_total = fat_mes['TotalCliente'].sum()
-    num_vendas = fat_mes.shape[0]
-    num_clientes = fat_mes['Cliente'].nunique()
+    faturamento_total = resumo['total']
+    num_vendas = int(resumo['sales'])
+    num_clientes = int(resumo['clients'])
     ticket_medio_venda = faturamento_total / num_vendas if num_vendas else 0
     ticket_medio_cliente = faturamento_total / num_clientes if num_clientes else 0
 
-    melhor_vendedor = fat_mes.groupby('Vendedor')['TotalCliente'].sum().idxmax()
-    melhor_vendedor_valor = fat_mes.groupby('Vendedor')['TotalCliente'].sum().max()
-    melhor_cliente = fat_mes.groupby('Cliente')['TotalCliente'].sum().idxmax()
-    melhor_cliente_valor = fat_mes.groupby('Cliente')['TotalCliente'].sum().max()
+    melhor_vendedor, melhor_vendedor_valor = top5_vendedores.index[0], top5_vendedores.iloc[0]
+    melhor_cliente, melhor_cliente_valor = top5_clientes.index[0], top5_clientes.iloc[0]
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Faturamento Total", format_currency(faturamento_total))
@@ -309,29 +177,22 @@ def faturamento_page():
     col_vend, col_cli = st.columns([1, 1])
     with col_vend:
         st.markdown("### Top 5 Vendedores")
-        top5_vendedores = fat_mes.groupby('Vendedor')['TotalCliente'].sum().nlargest(5)
-        fig_vend = go.Figure(go.Bar(x=top5_vendedores.values, y=top5_vendedores.index,
-                                    orientation='h', marker_color='purple'))
-        fig_vend.update_layout(template='plotly_dark', height=300, title="Top 5 Vendedores")
-        st.plotly_chart(fig_vend, use_container_width=True)
+        with etapa('grafico'):
+            st.plotly_chart(figura_top_faturamento(fonte, mes, 'vendedor'), use_container_width=True)
 
     with col_cli:
         st.markdown("### Top 5 Clientes")
-        top5_clientes = fat_mes.groupby('Cliente')['TotalCliente'].sum().nlargest(5)
-        fig_cli = go.Figure(go.Bar(x=top5_clientes.values, y=top5_clientes.index,
-                                   orientation='h', marker_color='orange'))
-        fig_cli.update_layout(template='plotly_dark', height=300, title="Top 5 Clientes")
-        st.plotly_chart(fig_cli, use_container_width=True)
+        with etapa('grafico'):
+            st.plotly_chart(figura_top_faturamento(fonte, mes, 'cliente'), use_container_width=True)
 
     st.markdown("### Evolução Mensal do Faturamento")
-    evolucao_mensal = fat[meses].sum()
-    fig = go.Figure(go.Scatter(x=meses, y=evolucao_mensal, mode='lines+markers', line_color='blue'))
-    fig.update_layout(template='plotly_dark', height=400)
-    st.plotly_chart(fig, use_container_width=True)
+    with etapa('grafico'):
+        # não depende do mês selecionado
+        st.plotly_chart(figura_evolucao_faturamento(fonte), use_container_width=True)
 
 
-def analise_gastos_page(df_cpa, df_cre):
-    st.markdown("<h2 style='font-size:28px;'>DRE Trimestral 2024</h2>", unsafe_allow_html=True)
+def analise_gastos_page(fonte):
+    st.markdown(f"<h2 style='font-size:28px;'>DRE Trimestral {fonte.ano}</h2>", unsafe_allow_html=True)
 
     meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
              'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
@@ -350,266 +211,100 @@ def analise_gastos_page(df_cpa, df_cre):
         "Despesas Financeiras", "Lucro Líquido"
     ]
 
-    def calcular_kpis(mes=None):
-        if mes:
-            cpa = df_cpa[df_cpa['DataPagamento'].dt.month == mes]
-            cre = df_cre[df_cre['DataPagamento'].dt.month == mes]
-        else:
-            cpa = df_cpa.copy()
-            cre = df_cre.copy()
-
-        receitas_total = cre[cre['Valor'] > 0]['Valor'].sum()
-        deducoes = cre[cre['Categoria'].str.contains('desconto|devolução', case=False, na=False)]['Valor'].abs().sum()
-        receita_liquida = receitas_total - deducoes
-
-        folha = cpa[cpa['Grupo'].str.lower() == 'despesas com folha']['Valor'].sum()
-        folha_var = folha * 0.6
-        folha_fix = folha * 0.4
-
-        cpa_var = cpa[(cpa['Classificação'].str.lower() == 'variável') &
-                      (~cpa['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]
-        cpa_fix = cpa[(cpa['Classificação'].str.lower() == 'fixo') &
-                      (~cpa['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]
-
-        desp_var = cpa_var['Valor'].sum() + folha_var
-        desp_fix = cpa_fix['Valor'].sum() + folha_fix
-        impostos = cpa[cpa['Grupo'].str.lower() == 'imposto']['Valor'].sum() + \
-                   cpa[cpa['ContaPadrao'].str.lower().str.contains('simples nacional', na=False)]['Valor'].sum()
-        despesas_financeiras = cpa[cpa['Grupo'].str.lower() == 'despesas financeiras']['Valor'].sum()
-
-        lucro_bruto = receita_liquida - impostos - desp_var
-        ebitda = lucro_bruto - desp_fix
-        lucro_liquido = receita_liquida - (impostos + desp_var + desp_fix + despesas_financeiras)
-
-        return {
-            "Receita Total": receitas_total,
-            "Deduções": deducoes,
-            "Receita Líquida": receita_liquida,
-            "Impostos": impostos,
-            "Custos Variáveis": desp_var,
-            "Lucro Bruto": lucro_bruto,
-            "Custos Fixos": desp_fix,
-            "EBITDA": ebitda,
-            "Despesas Financeiras": despesas_financeiras,
-            "Lucro Líquido": lucro_liquido
-        }
-
     def montar_df(kpis):
         valores = [
-            kpis["Receita Total"],
-            kpis["Deduções"],
-            kpis["Receita Líquida"],
-            kpis["Impostos"],
-            kpis["Custos Variáveis"],
-            kpis["Lucro Bruto"],
-            kpis["Custos Fixos"],
-            kpis["EBITDA"],
-            kpis["Despesas Financeiras"],
-            kpis["Lucro Líquido"]
+            kpis.receita_total,
+            kpis.deducoes,
+            kpis.receita_liquida,
+            kpis.impostos,
+            kpis.custos_variaveis,
+            kpis.lucro_bruto,
+            kpis.custos_fixos,
+            kpis.ebitda,
+            kpis.despesas_financeiras,
+            kpis.lucro_liquido
         ]
 
         df = pd.DataFrame({
             " ": simbolos,
             "Indicador": itens,
-            "Valor": [format_currency(v) for v in valores]
+            "Valor": format_currency(valores)
         })
         return df
 
     col1, col2, col3, col4 = st.columns([1, 1, 1, 1.2])
     with col1:
         st.markdown(f"**DRE ({meses[mes_ant - 1]})**")
-        st.dataframe(montar_df(calcular_kpis(mes_ant)), height=410, use_container_width=True, hide_index=True)
+        st.dataframe(montar_df(fonte.kpis(mes_ant)), height=410, use_container_width=True, hide_index=True)
 
     with col2:
         st.markdown(f"**DRE ({meses[mes_index - 1]})**")
-        st.dataframe(montar_df(calcular_kpis(mes_index)), height=410, use_container_width=True, hide_index=True)
+        st.dataframe(montar_df(fonte.kpis(mes_index)), height=410, use_container_width=True, hide_index=True)
 
     with col3:
         st.markdown(f"**DRE ({meses[mes_pos - 1]})**")
-        st.dataframe(montar_df(calcular_kpis(mes_pos)), height=410, use_container_width=True, hide_index=True)
+        st.dataframe(montar_df(fonte.kpis(mes_pos)), height=410, use_container_width=True, hide_index=True)
 
     with col4:
         st.markdown("**DRE (Anual)**")
-        st.dataframe(montar_df(calcular_kpis(None)), height=410, use_container_width=True, hide_index=True)
+        st.dataframe(montar_df(fonte.kpis(ANUAL)), height=410, use_container_width=True, hide_index=True)
+
+    botoes_exportacao(f"dre_trimestral_{fonte.empresa}_{fonte.ano}_{mes_nome}",
+                      lambda formato: exportacao.trimestral(fonte, mes_index, formato), "exp_trimestral")
 
 
-def dre_completo_page():
+def dre_completo_page(fonte):
     st.markdown("<h2 style='font-size:28px;'>DRE Completo</h2>", unsafe_allow_html=True)
-    base_path = os.path.join(os.path.dirname(__file__), 'data')
-    path_apagar = f'{base_path}/contasapagar2024.xlsx'
-    path_areceber = f'{base_path}/contasareceber2024.xlsx'
-    path_classif = f'{base_path}/Classificacao_Custos_Variavel_x_Fixo.xlsx'
 
     meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
              'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
 
-    # === Leitura e preparação dos dados ===
-    xls_ap = pd.ExcelFile(path_apagar)
-    cpa_raw = pd.concat([xls_ap.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-    cpa_raw['DataPagamento'] = pd.to_datetime(cpa_raw['Pagto'], dayfirst=True, errors='coerce')
-
-    classif_df = pd.read_excel(path_classif, sheet_name=0)
-    map_df = pd.read_excel(path_classif, sheet_name=1)
-    cpa_raw['CategoriaLimpa'] = cpa_raw['Categoria'].astype(str).str.replace(r'^\d+\s*', '', regex=True)
-    cpa = cpa_raw.merge(map_df.rename(columns={'contasantigas': 'CategoriaLimpa'}), on='CategoriaLimpa', how='left')
-    cpa['ContaPadrao'] = cpa['contasnovas'].combine_first(cpa['CategoriaLimpa'])
-    cpa = cpa.merge(classif_df.rename(columns={'Conta': 'ContaPadrao'}), on='ContaPadrao', how='left')
-
-    xls_cr = pd.ExcelFile(path_areceber)
-    cre = pd.concat([xls_cr.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-    cre['DataPagamento'] = pd.to_datetime(cre['Pagto.'], dayfirst=True, errors='coerce')
-
-    dre_data = []
-
-    for i, mes in enumerate(meses, start=1):
-        receita_total = cre[(cre['DataPagamento'].dt.month == i) & (cre['Valor'] > 0)]['Valor'].sum()
-
-        deducoes_neg = abs(cre[(cre['DataPagamento'].dt.month == i) &
-                               (cre['Valor'] < 0) &
-                               (cre['Categoria'].str.contains('desconto|devolução', case=False, na=False))]['Valor'].sum())
-
-        deducoes_pos = cre[(cre['DataPagamento'].dt.month == i) &
-                           (cre['Valor'] > 0) &
-                           (cre['Categoria'].str.contains('desconto|devolução', case=False, na=False))]['Valor'].sum()
-
-        deducoes = deducoes_neg + deducoes_pos
-        receita_liquida = receita_total - deducoes
-
-        cpa_mes = cpa[cpa['DataPagamento'].dt.month == i]
-        folha_mes = cpa_mes[cpa_mes['Grupo'].str.lower() == 'despesas com folha']['Valor'].sum()
-        folha_var_mes = folha_mes * 0.6
-        folha_fix_mes = folha_mes * 0.4
-
-        cpa_desp_var_mes = cpa_mes[(cpa_mes['Classificação'].str.lower() == 'variável') &
-                                   (~cpa_mes['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]['Valor'].sum()
-        desp_var_mes = cpa_desp_var_mes + folha_var_mes
-
-        cpa_desp_fix_mes = cpa_mes[(cpa_mes['Classificação'].str.lower() == 'fixo') &
-                                   (~cpa_mes['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]['Valor'].sum()
-        desp_fix_mes = cpa_desp_fix_mes + folha_fix_mes
-
-        despesas_financeiras_mes = cpa_mes[cpa_mes['Grupo'].str.lower() == 'despesas financeiras']['Valor'].sum()
-        impostos_mes = cpa_mes[cpa_mes['Grupo'].str.lower() == 'imposto']['Valor'].sum()
-        simples_nacional_mes = cpa_mes[cpa_mes['ContaPadrao'].str.lower().str.contains('simples nacional', na=False)]['Valor'].sum()
-        total_impostos_mes = impostos_mes + simples_nacional_mes
-
-        # ⚠️ Lucro Bruto agora deduz impostos ANTES
-        lucro_bruto = receita_liquida - total_impostos_mes - desp_var_mes
-        ebitda = lucro_bruto - desp_fix_mes
-        lucro_liquido = receita_liquida - (desp_var_mes + desp_fix_mes + despesas_financeiras_mes + total_impostos_mes)
-
-        dre_data.append({
-            'Mês': mes,
-            'Receita Total': receita_total,
-            'Deduções': deducoes,
-            'Receita Líquida': receita_liquida,
-            'Impostos': total_impostos_mes,
-            'Custos Variáveis': desp_var_mes,
-            'Lucro Bruto': lucro_bruto,
-            'Custos Fixos': desp_fix_mes,
-            'EBITDA': ebitda,
-            'Despesas Financeiras': despesas_financeiras_mes,
-            'Lucro Líquido': lucro_liquido
-        })
-
-    df_dre = pd.DataFrame(dre_data)
+    df_dre = fonte.dre().loc[MESES_IDX, DRE_LINHAS].reset_index(drop=True)
+    df_dre.insert(0, 'Mês', meses)
 
     # Adiciona linhas extras
     empty_row = {col: '' for col in df_dre.columns}
     total_row = {col: df_dre[col].sum() if col != 'Mês' else 'Total' for col in df_dre.columns}
     df_dre = pd.concat([df_dre, pd.DataFrame([empty_row]), pd.DataFrame([total_row])], ignore_index=True)
 
-    # Formata para exibição
-    df_dre_display = df_dre.copy()
-    df_dre_display.index = [str(i + 1) if i < len(df_dre) - 2 else '' for i in range(len(df_dre))]
+    with etapa('tabela', linhas=len(df_dre)):
+        # Formata para exibição
+        df_dre_display = df_dre.copy()
+        df_dre_display.index = [str(i + 1) if i < len(df_dre) - 2 else '' for i in range(len(df_dre))]
 
-    cols_moeda = df_dre.columns.drop(['Mês'])
-    for col in cols_moeda:
-        df_dre_display[col] = df_dre_display[col].apply(lambda x: format_currency(x) if isinstance(x, (int, float)) else x)
+        cols_moeda = df_dre.columns.drop(['Mês'])
+        for col in cols_moeda:
+            df_dre_display[col] = format_currency(df_dre_display[col])
 
-    st.markdown("### Demonstrativo de Resultados (DRE) Mensal com Total")
-    st.dataframe(df_dre_display, use_container_width=True, height=525)
+        st.markdown("### Demonstrativo de Resultados (DRE) Mensal com Total")
+        st.dataframe(df_dre_display, use_container_width=True, height=525)
+        botoes_exportacao(f"dre_mensal_{fonte.empresa}_{fonte.ano}",
+                          lambda formato: exportacao.dre_completo(fonte, formato), "exp_dre")
 
     # Gráfico
     st.markdown("### Composição Visual do DRE (por Mês)")
-    fig = go.Figure()
-    for nome, cor in [
-        ('Receita Total', 'blue'),
-        ('Custos Variáveis', 'orange'),
-        ('Custos Fixos', 'purple'),
-        ('Despesas Financeiras', 'red'),
-        ('Impostos', 'brown'),
-        ('Lucro Líquido', 'green')
-    ]:
-        fig.add_trace(go.Bar(x=df_dre['Mês'][:-2], y=df_dre[nome][:-2], name=nome, marker_color=cor))
-    fig.update_layout(barmode='group', template='plotly_dark', height=500)
-    st.plotly_chart(fig, use_container_width=True)
 
-def relatorio_executivo_page():
+    with etapa('grafico'):
+        st.plotly_chart(figura_dre_completo(fonte), use_container_width=True)
+
+def relatorio_executivo_page(fonte):
     st.markdown("<h2 style='font-size:28px;'>Relatório Executivo: Lucro Líquido Negativo</h2>", unsafe_allow_html=True)
 
-    # Recalcular variáveis reais (mesma lógica do dashboard)
-    base_path = os.path.join(os.path.dirname(__file__), 'data')
-    path_apagar = f'{base_path}/contasapagar2024.xlsx'
-    path_areceber = f'{base_path}/contasareceber2024.xlsx'
-    path_classif = f'{base_path}/Classificacao_Custos_Variavel_x_Fixo.xlsx'
-
-    xls_ap = pd.ExcelFile(path_apagar)
-    cpa_raw = pd.concat([xls_ap.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-    cpa_raw['DataPagamento'] = pd.to_datetime(cpa_raw['Pagto'], dayfirst=True, errors='coerce')
-
-    classif_df = pd.read_excel(path_classif, sheet_name=0)
-    map_df = pd.read_excel(path_classif, sheet_name=1)
-    cpa_raw['CategoriaLimpa'] = cpa_raw['Categoria'].astype(str).str.replace(r'^\d+\s*', '', regex=True)
-    cpa = cpa_raw.merge(map_df.rename(columns={'contasantigas': 'CategoriaLimpa'}), on='CategoriaLimpa', how='left')
-    cpa['ContaPadrao'] = cpa['contasnovas'].combine_first(cpa['CategoriaLimpa'])
-    cpa = cpa.merge(classif_df.rename(columns={'Conta': 'ContaPadrao'}), on='ContaPadrao', how='left')
-
-    xls_cr = pd.ExcelFile(path_areceber)
-    cre = pd.concat([xls_cr.parse(sheet) for sheet in ['teutocar', 'teutomaq']], ignore_index=True)
-    cre['DataPagamento'] = pd.to_datetime(cre['Pagto.'], dayfirst=True, errors='coerce')
-
-    cre_filtered = cre
-    cpa_filtered = cpa
-
-    receitas_total = cre_filtered[cre_filtered['Valor'] > 0]['Valor'].sum()
-    deducoes_neg = abs(cre_filtered[(cre_filtered['Valor'] < 0) &
-                                    (cre_filtered['Categoria'].str.contains('desconto|devolução', case=False, na=False))]['Valor'].sum())
-    deducoes_pos = cre_filtered[(cre_filtered['Valor'] > 0) &
-                                (cre_filtered['Categoria'].str.contains('desconto|devolução', case=False, na=False))]['Valor'].sum()
-    deducoes = deducoes_neg + deducoes_pos
-
-    receita_liquida = receitas_total - deducoes
-
-    cpa_no_transf = cpa_filtered[~cpa_filtered['ContaPadrao'].str.contains('transferência entre contas', case=False, na=False)]
-    folha_total = cpa_no_transf[cpa_no_transf['Grupo'].str.lower() == 'despesas com folha']['Valor'].sum()
-    folha_var = folha_total * 0.6
-    folha_fix = folha_total * 0.4
-
-    cpa_desp_var = cpa_no_transf[(cpa_no_transf['Classificação'].str.lower() == 'variável') &
-                                 (~cpa_no_transf['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]
-    desp_var = cpa_desp_var['Valor'].sum() + folha_var
-
-    cpa_desp_fix = cpa_no_transf[(cpa_no_transf['Classificação'].str.lower() == 'fixo') &
-                                 (~cpa_no_transf['Grupo'].str.lower().isin(['imposto', 'despesas financeiras']))]
-    desp_fix = cpa_desp_fix['Valor'].sum() + folha_fix
-
-    despesas_financeiras = cpa_no_transf[cpa_no_transf['Grupo'].str.lower() == 'despesas financeiras']['Valor'].sum()
-    impostos = cpa_no_transf[cpa_no_transf['Grupo'].str.lower() == 'imposto']['Valor'].sum()
-    simples_nacional = cpa_no_transf[cpa_no_transf['ContaPadrao'].str.lower().str.contains('simples nacional', na=False)]['Valor'].sum()
-    total_impostos = impostos + simples_nacional
-
-    margem_contribuicao = ((receita_liquida - desp_var) / receita_liquida * 100) if receita_liquida else 0
-    ponto_equilibrio = desp_fix / (margem_contribuicao / 100) if margem_contribuicao else 0
-    lucro_liquido = receita_liquida - (desp_fix + desp_var + despesas_financeiras + total_impostos)
-
-    faturamento_operacional = receita_liquida + deducoes
-    margem_contribuicao_total = receita_liquida - desp_var
+    # Mesmos indicadores do dashboard (API única de KPIs)
+    kpis = fonte.kpis(ANUAL)
+    receitas_total = kpis.receita_total
+    receita_liquida = kpis.receita_liquida
+    desp_var = kpis.custos_variaveis
+    despesas_financeiras = kpis.despesas_financeiras
+    lucro_liquido = kpis.lucro_liquido
+    ponto_equilibrio = kpis.ponto_equilibrio
+
+    faturamento_operacional = receita_liquida + kpis.deducoes
     margem_liquida = (lucro_liquido / receita_liquida) * 100 if receita_liquida else 0
 
     st.write("📋 **Relatório Especial: 5 Fatores que Explicam o Lucro Líquido Negativo — Alan Weiss Style**")
     st.write(f"1️⃣ **Faturamento abaixo das Receitas Contábeis**")
-    st.write(f"As Receitas Totais em 2024 somam {format_currency(receitas_total)}, enquanto o Faturamento Operacional efetivo foi {format_currency(faturamento_operacional)}, mostrando que parte da receita veio de fontes não recorrentes.")
+    st.write(f"As Receitas Totais em {fonte.ano} somam {format_currency(receitas_total)}, enquanto o Faturamento Operacional efetivo foi {format_currency(faturamento_operacional)}, mostrando que parte da receita veio de fontes não recorrentes.")
 
     st.write(f"2️⃣ **Despesas Financeiras Altas pela Falta de Capital de Giro**")
     st.write(f"As despesas financeiras somaram {format_currency(despesas_financeiras)}, representando aproximadamente {(despesas_financeiras / receitas_total) * 100:.2f}% das Receitas Totais.")
@@ -619,10 +314,191 @@ def relatorio_executivo_page():
 
     st.write(f"4️⃣ **Crescimento Desalinhado entre Custos Variáveis e Receita**")
     st.write(f"Enquanto a Receita cresceu {(faturamento_operacional / receitas_total) * 100:.2f}% no ano, os Custos Variáveis atingiram {format_currency(desp_var)}, absorvendo boa parte da margem bruta.")
-    st.write(f"Índice Margem de Contribuição: aproximadamente {(margem_contribuicao_total / receita_liquida) * 100:.2f}%")
+    st.write(f"Índice Margem de Contribuição: aproximadamente {kpis.margem_contribuicao:.2f}%")
 
     st.write(f"5️⃣ **Margem Líquida Negativa Reflete Problemas Estratégicos**")
     st.write(f"O Lucro Líquido representa {margem_liquida:.2f}% das Receitas Líquidas.")
 
+
+def simulacao_page(fonte):
+    st.markdown("<h2 style='font-size:28px;'>Simulação de Cenários</h2>", unsafe_allow_html=True)
+
+    # A simulação precisa dos lançamentos por Grupo: só com as planilhas do conjunto
+    try:
+        base = cenarios.base(datasets.obter(fonte.empresa, fonte.ano))
+    except (KeyError, OSError):
+        st.info("A simulação usa as planilhas de contas a pagar e a receber, indisponíveis para este conjunto.")
+        return
+
+    meses = MESES_NOMES
+    col_periodo, col_grupos = st.columns([1, 3])
+    mes_sel = col_periodo.selectbox("Período:", ["Anual"] + meses, index=0, key="cenarios_periodo")
+    mes = meses.index(mes_sel) + 1 if mes_sel != "Anual" else ANUAL
+    grupos = col_grupos.multiselect("Grupos com variação de custo (%):", list(base.grupos), key="cenarios_grupos")
+
+    st.markdown("### Cenários")
+    st.caption("Volume muda receita, deduções, custos variáveis e impostos; preço muda receita, deduções e "
+               "impostos; a variação por Grupo vale para todos os lançamentos do Grupo. A primeira linha é a referência.")
+    padrao = pd.DataFrame([
+        {"Cenário": "Base", "Folha variável (%)": 60.0, "Volume (%)": 0.0, "Preço (%)": 0.0},
+        {"Cenário": "Folha 50/50", "Folha variável (%)": 50.0, "Volume (%)": 0.0, "Preço (%)": 0.0},
+        {"Cenário": "Preço +5%", "Folha variável (%)": 60.0, "Volume (%)": 0.0, "Preço (%)": 5.0},
+        {"Cenário": "Volume -10%", "Folha variável (%)": 60.0, "Volume (%)": -10.0, "Preço (%)": 0.0},
+    ]).assign(**{g: 0.0 for g in grupos})
+    # A chave muda com os Grupos escolhidos: a tabela é recriada com as colunas novas
+    tabela = st.data_editor(padrao, num_rows="dynamic", hide_index=True, use_container_width=True,
+                            key=f"cenarios_tabela_{'|'.join(grupos)}")
+    # Linhas novas chegam com células vazias: folha no rateio padrão, variações em zero
+    tabela = tabela.fillna({"Folha variável (%)": 60.0}).fillna({c: 0.0 for c in tabela.columns if c != "Cenário"})
+    if tabela.empty:
+        st.info("Inclua ao menos um cenário.")
+        return
+
+    lista = [cenarios.Cenario(nome=str(linha["Cenário"]) if pd.notna(linha["Cenário"]) else f"Cenário {i + 1}",
+                              folha_perc_var=float(linha["Folha variável (%)"]) / 100,
+                              volume=float(linha["Volume (%)"]),
+                              preco=float(linha["Preço (%)"]),
+                              custos=tuple((g, float(linha[g])) for g in grupos))
+             for i, (_, linha) in enumerate(tabela.iterrows())]
+    resultado = cenarios.simular(base, lista, mes)
+
+    exibicao = pd.DataFrame({
+        "Receita Líquida": format_currency(resultado["Receita Líquida"]),
+        "Lucro Líquido": format_currency(resultado["Lucro Líquido"]),
+        "Δ Lucro vs referência": format_currency(resultado["Lucro Líquido"] - resultado["Lucro Líquido"].iloc[0]),
+        "Ponto de Equilíbrio": format_currency(resultado["Ponto de Equilíbrio"]),
+        "Margem de Contribuição": numero(resultado["Margem de Contribuição"]) + "%",
+        "Margem Líquida": numero(resultado["Margem Líquida"]) + "%",
+    }, index=resultado.index)
+    st.dataframe(exibicao, use_container_width=True)
+
+    fig = go.Figure(go.Bar(
+        x=resultado.index, y=resultado["Lucro Líquido"],
+        marker_color=['green' if v >= 0 else 'red' for v in resultado["Lucro Líquido"]],
+        text=moeda(resultado["Lucro Líquido"].tolist(), casas=0), textposition="outside"
+    ))
+    fig.update_layout(template='plotly_dark', height=380, title=f"Lucro Líquido por cenário ({mes_sel})")
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Sensibilidade: todas as combinações de volume x preço sobre o cenário de referência
+    st.markdown("### Sensibilidade: Volume x Preço")
+    col_vol, col_preco = st.columns(2)
+    faixa_vol = col_vol.slider("Volume (%)", -50, 50, (-20, 20), step=5, key="cenarios_faixa_volume")
+    faixa_preco = col_preco.slider("Preço (%)", -30, 30, (-10, 10), step=2, key="cenarios_faixa_preco")
+    referencia = lista[0]
+    volumes = list(range(faixa_vol[0], faixa_vol[1] + 1, 5))
+    precos = list(range(faixa_preco[0], faixa_preco[1] + 1, 2))
+    with etapa('grafico'):
+        sensibilidade = cenarios.grade(
+            base, mes, folha_perc_var=[referencia.folha_perc_var], volume=volumes, preco=precos,
+            custos={g: [v] for g, v in referencia.custos})
+        lucro = sensibilidade["Lucro Líquido"].to_numpy().reshape(len(volumes), len(precos))
+        fig = go.Figure(go.Heatmap(
+            z=lucro, x=[f"{p:+d}%" for p in precos], y=[f"{v:+d}%" for v in volumes],
+            colorscale='RdYlGn', zmid=0, text=moeda(lucro, casas=0),
+            hovertemplate="Volume %{y}<br>Preço %{x}<br>Lucro %{text}<extra></extra>"
+        ))
+        fig.update_layout(template='plotly_dark', height=480, xaxis_title="Preço", yaxis_title="Volume",
+                          title=f"Lucro Líquido ({len(sensibilidade)} cenários, {mes_sel})")
+        st.plotly_chart(fig, use_container_width=True)
+
+
+# ───────────── Figuras (em cache por versão dos dados, ver graficos.py) ─────────────
+# Fora das páginas para que o aquecimento (aquecimento.py) monte as mesmas figuras
+
+MESES_NOMES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho',
+               'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+
+def figura_dashboard(fonte, mes_atual_index):
+    """Evolução mensal de receita e lucro; o mês atual (0-based) muda a faixa destacada."""
+    meses = MESES_NOMES
+
+    def montar_figura():
+        dre_meses = fonte.dre().loc[MESES_IDX]
+        receita_liquida_mensal = dre_meses['Receita Líquida'].tolist()
+        lucro_liquido_mensal = dre_meses['Lucro Líquido'].tolist()
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=meses,
+            y=receita_liquida_mensal,
+            mode='lines+markers+text',
+            name='Receita Líquida',
+            line=dict(color='blue'),
+            text=moeda(receita_liquida_mensal, casas=0),
+            textposition="top center"
+        ))
+        fig.add_trace(go.Scatter(
+            x=meses,
+            y=lucro_liquido_mensal,
+            mode='lines+markers+text',
+            name='Lucro Líquido',
+            line=dict(color='green'),
+            marker=dict(color=['green' if val >= 0 else 'red' for val in lucro_liquido_mensal]),
+            text=moeda(lucro_liquido_mensal, casas=0),
+            textposition="bottom center"
+        ))
+        fig.add_vrect(
+            x0=meses[mes_atual_index], x1=meses[mes_atual_index],
+            line_width=0, fillcolor="gray", opacity=0.2,
+            annotation_text="Mês Atual", annotation_position="top left"
+        )
+        fig.update_layout(
+            template='plotly_dark',
+            height=420,
+            title='Evolução Mensal de Receita Líquida e Lucro Líquido (Anual)',
+            xaxis_title="Mês",
+            yaxis_title="Valor (R$)"
+        )
+        return fig
+
+    return graficos.figura(fonte, 'dashboard', mes_atual_index, montar_figura)
+
+
+TOPS_FATURAMENTO = {'vendedor': ('faturamento:vendedores', 'purple', "Top 5 Vendedores"),
+                    'cliente': ('faturamento:clientes', 'orange', "Top 5 Clientes")}
+
+
+def figura_top_faturamento(fonte, mes, dimensao):
+    """Barras do top 5 de vendedores ou clientes ('vendedor'/'cliente') no mês."""
+    pagina, cor, titulo = TOPS_FATURAMENTO[dimensao]
+
+    def montar_top():
+        top = fonte.top_faturamento(mes, dimensao, 5)
+        fig = go.Figure(go.Bar(x=top.values, y=top.index, orientation='h', marker_color=cor))
+        fig.update_layout(template='plotly_dark', height=300, title=titulo)
+        return fig
+    return graficos.figura(fonte, pagina, mes, montar_top)
+
+
+def figura_evolucao_faturamento(fonte):
+    # não depende do mês selecionado
+    def montar_evolucao():
+        fig = go.Figure(go.Scatter(x=MESES_NOMES, y=fonte.evolucao_faturamento(), mode='lines+markers',
+                                   line_color='blue'))
+        fig.update_layout(template='plotly_dark', height=400)
+        return fig
+    return graficos.figura(fonte, 'faturamento:evolucao', None, montar_evolucao)
+
+
+def figura_dre_completo(fonte):
+    def montar_figura():
+        dre = fonte.dre().loc[MESES_IDX]
+        fig = go.Figure()
+        for nome, cor in [
+            ('Receita Total', 'blue'),
+            ('Custos Variáveis', 'orange'),
+            ('Custos Fixos', 'purple'),
+            ('Despesas Financeiras', 'red'),
+            ('Impostos', 'brown'),
+            ('Lucro Líquido', 'green')
+        ]:
+            fig.add_trace(go.Bar(x=MESES_NOMES, y=dre[nome].tolist(), name=nome, marker_color=cor))
+        fig.update_layout(barmode='group', template='plotly_dark', height=500)
+        return fig
+    return graficos.figura(fonte, 'dre_completo', None, montar_figura)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,111 @@
+"""Registro de conjuntos de dados por (empresa, ano).
+
+O registro é um JSON (DRE_DATASETS, padrão <DATA_DIR>/datasets.json) com uma lista de
+entradas como:
+
+    [{"empresa": "TeutoMaq", "ano": 2024, "pasta": ".", "abas": ["teutocar", "teutomaq"]}]
+
+`pasta` é relativa ao arquivo do registro; `abas` e `arquivos` são opcionais. Sem o
+arquivo, o único conjunto é TeutoMaq/2024 em DATA_DIR (layout original).
+"""
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+# Pasta padrão das planilhas (pode ser trocada via variável de ambiente)
+DATA_DIR = os.environ.get('DRE_DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+REGISTRO = os.environ.get('DRE_DATASETS', os.path.join(DATA_DIR, 'datasets.json'))
+
+SHEETS = ['teutocar', 'teutomaq']
+EMPRESA_PADRAO = 'TeutoMaq'
+ANO_PADRAO = 2024
+
+# Nomes dos arquivos; {ano} é trocado pelo ano do conjunto
+ARQ_APAGAR = 'contasapagar{ano}.xlsx'
+ARQ_ARECEBER = 'contasareceber{ano}.xlsx'
+ARQ_CLASSIF = 'Classificacao_Custos_Variavel_x_Fixo.xlsx'
+ARQ_FATURAMENTO = 'faturamento{ano}.xlsx'
+ARQUIVOS = {'apagar': ARQ_APAGAR, 'areceber': ARQ_ARECEBER,
+            'classif': ARQ_CLASSIF, 'faturamento': ARQ_FATURAMENTO}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Planilhas de uma empresa num ano."""
+    empresa: str
+    ano: int
+    pasta: str
+    abas: tuple = tuple(SHEETS)
+    arquivos: tuple = field(default=tuple(ARQUIVOS.items()))
+
+    @property
+    def chave(self):
+        """Identificador seguro para nomes de arquivo (snapshots) e chaves de cache."""
+        return re.sub(r'[^\w.-]+', '_', f'{self.empresa}-{self.ano}')
+
+    def caminho(self, tipo):
+        """Caminho da planilha `tipo` ('apagar', 'areceber', 'classif' ou 'faturamento')."""
+        return os.path.join(self.pasta, dict(self.arquivos)[tipo].format(ano=self.ano))
+
+    @classmethod
+    def da_pasta(cls, pasta, empresa=EMPRESA_PADRAO, ano=ANO_PADRAO):
+        return cls(empresa, ano, pasta)
+
+
+def _ler_registro(path):
+    with open(path, encoding='utf-8') as f:
+        entradas = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    datasets = []
+    for e in entradas:
+        datasets.append(Dataset(
+            empresa=e['empresa'],
+            ano=int(e['ano']),
+            pasta=os.path.join(base, e.get('pasta', '.')),
+            abas=tuple(e.get('abas', SHEETS)),
+            arquivos=tuple({**ARQUIVOS, **e.get('arquivos', {})}.items()),
+        ))
+    return datasets
+
+
+_registro = {'mtime': None, 'datasets': None}
+
+
+def listar():
+    """Todos os conjuntos registrados (relê o JSON quando ele muda)."""
+    try:
+        mtime = os.path.getmtime(REGISTRO)
+    except OSError:
+        return [Dataset.da_pasta(DATA_DIR)]
+    if _registro['mtime'] != mtime:
+        _registro['datasets'] = _ler_registro(REGISTRO)
+        _registro['mtime'] = mtime
+    return list(_registro['datasets'])
+
+
+def empresas():
+    return list(dict.fromkeys(d.empresa for d in listar()))
+
+
+def anos(empresa):
+    return sorted({d.ano for d in listar() if d.empresa == empresa}, reverse=True)
+
+
+def obter(empresa=None, ano=None):
+    """Conjunto de (empresa, ano); sem ano, o mais recente da empresa; sem nada, o primeiro."""
+    candidatos = [d for d in listar() if empresa is None or d.empresa == empresa]
+    if ano is not None:
+        candidatos = [d for d in candidatos if d.ano == int(ano)]
+    if not candidatos:
+        raise KeyError(f'conjunto de dados não registrado: {empresa}/{ano}')
+    return max(candidatos, key=lambda d: d.ano) if ano is None and empresa is not None else candidatos[0]
+
+
+def resolver(dataset=None):
+    """Aceita um Dataset, uma pasta (layout padrão) ou None (primeiro do registro)."""
+    if dataset is None:
+        return obter()
+    if isinstance(dataset, Dataset):
+        return dataset
+    return Dataset.da_pasta(dataset)
@@ -0,0 +1,224 @@
+"""Exportação (Excel/CSV) da DRE mensal, do comparativo trimestral e dos lançamentos.
+
+As tabelas saem dos frames numéricos em cache (não dos textos formatados das páginas)
+e são gravadas em disco em blocos: o Excel no modo constant_memory do xlsxwriter
+(linha a linha, sem montar a planilha em memória) e o CSV com to_csv por bloco. Cada
+arquivo fica em DRE_EXPORT_DIR indexado por (versão dos dados, tabela, filtro, formato);
+pedir de novo a mesma exportação só relê o arquivo. Só uma sessão gera cada arquivo; as
+outras esperam por ele, sem travar as demais exportações.
+
+Lançamentos de várias empresas/anos: `python dre/exportacao.py --formato csv --saida x.csv`.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+import xlsxwriter
+
+from dados import MESES, carregar_contas, versao_contas
+from datasets import listar, obter
+from motor_dre import ANUAL, DRE_LINHAS, MESES_IDX
+
+EXPORT_DIR = os.environ.get('DRE_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'dre-exportacoes'))
+MAX_ARQUIVOS = int(os.environ.get('DRE_EXPORT_MAX_ARQUIVOS', 64))
+TAMANHO_BLOCO = 50_000
+
+FORMATOS = {'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            'csv': 'text/csv'}
+
+# Colunas dos lançamentos exportados (contas a pagar já classificadas)
+COLUNAS_LANCAMENTOS = ['DataPagamento', 'Categoria', 'ContaPadrao', 'Grupo', 'Classificação',
+                       'Setor Cons.', 'Valor']
+
+_lock = threading.Lock()
+_locks = {}  # caminho -> lock de geração; podado junto com os arquivos (ver _podar)
+
+
+# ───────────────────────────── tabelas (numéricas) ─────────────────────────────
+
+def tabela_dre(fonte):
+    """DRE mensal com a linha Total, como na página DRE Completo."""
+    dre = fonte.dre().loc[MESES_IDX, DRE_LINHAS].reset_index(drop=True)
+    dre.insert(0, 'Mês', MESES)
+    total = pd.DataFrame([{'Mês': 'Total', **dre[DRE_LINHAS].sum().to_dict()}])
+    return pd.concat([dre, total], ignore_index=True)
+
+
+def tabela_trimestral(fonte, mes):
+    """Linhas da DRE no mês anterior, no mês, no seguinte e no ano, como na página DRE Trimestral."""
+    mes_ant, mes_pos = ((mes - 2) % 12) + 1, (mes % 12) + 1
+    periodos = [mes_ant, mes, mes_pos, ANUAL]
+    tabela = fonte.dre().loc[periodos, DRE_LINHAS].T
+    tabela.columns = [MESES[p - 1] if p != ANUAL else 'Anual' for p in periodos]
+    return tabela.rename_axis('Indicador').reset_index()
+
+
+def _blocos_lancamentos(conjuntos, mes):
+    # Um bloco por vez: nada de concatenar os lançamentos de todas as empresas em memória
+    for ds in conjuntos:
+        cpa, _ = carregar_contas(ds)
+        linhas = cpa if mes == ANUAL else cpa[cpa['Mes'] == mes]
+        linhas = linhas[COLUNAS_LANCAMENTOS]
+        for ini in range(0, max(len(linhas), 1), TAMANHO_BLOCO):
+            bloco = linhas.iloc[ini:ini + TAMANHO_BLOCO]
+            yield bloco.assign(Empresa=ds.empresa, Ano=ds.ano)[['Empresa', 'Ano'] + COLUNAS_LANCAMENTOS]
+
+
+def _blocos(df):
+    for ini in range(0, max(len(df), 1), TAMANHO_BLOCO):
+        yield df.iloc[ini:ini + TAMANHO_BLOCO]
+
+
+# ───────────────────────────── escrita em blocos ─────────────────────────────
+
+def _gravar_xlsx(blocos, path, aba):
+    # constant_memory: cada linha vai para o disco ao passar para a próxima, por isso a
+    # escrita é feita aqui linha a linha (o to_excel do pandas não respeita essa ordem)
+    wb = xlsxwriter.Workbook(path, {'constant_memory': True})
+    ws = wb.add_worksheet(aba[:31])
+    cabecalho = wb.add_format({'bold': True})
+    moeda = wb.add_format({'num_format': '"R$" #,##0.00'})
+    data = wb.add_format({'num_format': 'dd/mm/yyyy'})
+    linha = 0
+    for bloco in blocos:
+        if linha == 0:
+            ws.write_row(0, 0, list(bloco.columns), cabecalho)
+            linha = 1
+        escritores = []
+        for col in bloco.columns:
+            serie = bloco[col]
+            if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+                escritores.append((serie.dt.to_pydatetime().tolist(), data))
+            elif pd.api.types.is_float_dtype(serie.dtype):
+                escritores.append((serie.tolist(), moeda))
+            else:
+                escritores.append((serie.astype(object).tolist(), None))
+        for i in range(len(bloco)):
+            for j, (valores, formato) in enumerate(escritores):
+                valor = valores[i]
+                if valor is None or valor is pd.NaT or (isinstance(valor, float) and valor != valor):
+                    continue  # célula vazia
+                if formato is data:
+                    ws.write_datetime(linha, j, valor, data)
+                else:
+                    ws.write(linha, j, valor, formato)
+            linha += 1
+    wb.close()
+
+
+def _gravar_csv(blocos, path):
+    # ';' e vírgula decimal: abre direto no Excel em português
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        for i, bloco in enumerate(blocos):
+            bloco.to_csv(f, sep=';', decimal=',', index=False, header=i == 0,
+                         float_format='%.2f', date_format='%d/%m/%Y')
+
+
+def _podar():
+    # Mantém só os MAX_ARQUIVOS usados mais recentemente
+    try:
+        arquivos = [os.path.join(EXPORT_DIR, n) for n in os.listdir(EXPORT_DIR) if not n.endswith('.tmp')]
+        arquivos.sort(key=os.path.getmtime, reverse=True)
+        for path in arquivos[MAX_ARQUIVOS:]:
+            os.remove(path)
+    except OSError:
+        pass
+    # Locks de arquivos removidos (ou cuja geração falhou) que ninguém está usando
+    with _lock:
+        for path in [p for p, lock in _locks.items() if not lock.locked() and not os.path.exists(p)]:
+            del _locks[path]
+
+
+def arquivo(chave, formato, blocos, aba='DRE'):
+    """Caminho do arquivo da exportação `chave`; `blocos()` gera os frames só se ainda não existe."""
+    if formato not in FORMATOS:
+        raise ValueError(f'formato desconhecido: {formato}')
+    nome = hashlib.sha1(repr(chave).encode()).hexdigest()
+    path = os.path.join(EXPORT_DIR, f'{nome}.{formato}')
+    with _lock:
+        lock = _locks.setdefault(path, threading.Lock())
+    with lock:
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            if formato == 'xlsx':
+                _gravar_xlsx(blocos(), tmp, aba)
+            else:
+                _gravar_csv(blocos(), tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    _podar()
+    return path
+
+
+def _ler(path):
+    # O download do Streamlit guarda os bytes em memória de qualquer forma
+    return Path(path).read_bytes()
+
+
+# ───────────────────────────── exportações das páginas ─────────────────────────────
+
+def dre_completo(fonte, formato='xlsx'):
+    chave = (fonte.versao(), 'dre', None, formato)
+    return _ler(arquivo(chave, formato, lambda: _blocos(tabela_dre(fonte)), 'DRE mensal'))
+
+
+def trimestral(fonte, mes, formato='xlsx'):
+    chave = (fonte.versao(), 'trimestral', mes, formato)
+    return _ler(arquivo(chave, formato, lambda: _blocos(tabela_trimestral(fonte, mes)), 'DRE trimestral'))
+
+
+def _conjunto(fonte):
+    ds = getattr(fonte, 'dataset', None)
+    if ds is None:
+        try:
+            ds = obter(fonte.empresa, fonte.ano)
+        except KeyError:
+            return None
+    return ds if os.path.exists(ds.caminho('apagar')) else None
+
+
+def tem_lancamentos(fonte):
+    """As planilhas de lançamentos do conjunto estão disponíveis (ex.: fonte só no Postgres)?"""
+    return _conjunto(fonte) is not None
+
+
+def lancamentos(fonte, mes=ANUAL, formato='xlsx'):
+    """Lançamentos de contas a pagar do período (ANUAL = todos)."""
+    ds = _conjunto(fonte)
+    chave = (versao_contas(ds), 'lancamentos', mes, formato)
+    return _ler(arquivo(chave, formato, lambda: _blocos_lancamentos([ds], mes), 'Lançamentos'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta os lançamentos de um ou mais conjuntos de dados.')
+    parser.add_argument('--empresa', help='empresa do registro (padrão: todos os conjuntos registrados)')
+    parser.add_argument('--ano', type=int)
+    parser.add_argument('--mes', type=int, default=ANUAL, help='1-12 (padrão: ano todo)')
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+    parser.add_argument('--saida', required=True, help='arquivo de saída')
+    args = parser.parse_args()
+
+    conjuntos = [d for d in listar() if (args.empresa is None or d.empresa == args.empresa)
+                 and (args.ano is None or d.ano == args.ano)]
+    if not conjuntos:
+        sys.exit('nenhum conjunto de dados registrado com esse filtro')
+    if args.formato == 'xlsx':
+        _gravar_xlsx(_blocos_lancamentos(conjuntos, args.mes), args.saida, 'Lançamentos')
+    else:
+        _gravar_csv(_blocos_lancamentos(conjuntos, args.mes), args.saida)
+    print(f'{len(conjuntos)} conjunto(s) exportado(s) para {args.saida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Formatação de números e moeda no padrão brasileiro (1.234,56), para páginas e exportações.
+
+`moeda` e `numero` aceitam um valor, uma lista, um array ou uma Series inteira: cada
+valor distinto é formatado uma vez (np.unique) e o texto volta para todas as posições,
+e os valores já vistos ficam num cache do processo. Em colunas object (ex.: tabela com
+linha em branco) só os números são formatados; o resto passa como está.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Textos já formatados, por modelo (o mesmo DRE volta a cada rerun); esvaziado ao passar do limite
+CACHE_MAX = 200_000
+_cache = {}
+
+
+def _modelo(casas, prefixo):
+    # '_' como milhar no format e depois troca: 1_234.56 -> 1.234,56
+    return prefixo + '{:_.%df}' % casas
+
+
+def _texto(modelo, valor):
+    return modelo.format(valor).replace('.', ',').replace('_', '.')
+
+
+def _conhecidos(modelo):
+    if sum(len(c) for c in _cache.values()) > CACHE_MAX:
+        _cache.clear()
+    return _cache.setdefault(modelo, {})
+
+
+def _formatar(valor, casas, prefixo):
+    modelo = _modelo(casas, prefixo)
+    if valor == 0:  # 0.0 e -0.0 teriam a mesma chave no cache, mas textos diferentes
+        return _texto(modelo, valor)
+    conhecidos = _conhecidos(modelo)
+    try:
+        texto = conhecidos.get(valor)
+    except TypeError:  # valor não hashable
+        return _texto(modelo, valor)
+    if texto is None:
+        texto = conhecidos[valor] = _texto(modelo, valor)
+    return texto
+
+
+def _formatar_array(arr, casas, prefixo):
+    if arr.dtype == object:
+        resultado = arr.copy()
+        numeros = np.array([isinstance(v, (int, float)) for v in arr.ravel()], dtype=bool).reshape(arr.shape)
+        if numeros.any():
+            resultado[numeros] = _formatar_array(arr[numeros].astype('float64'), casas, prefixo)
+        return resultado
+    # Cada valor distinto é formatado uma vez; únicos pelos bits do float (0.0 != -0.0)
+    valores = np.ascontiguousarray(arr, dtype='float64').ravel()
+    _, primeiros, inversos = np.unique(valores.view('int64'), return_index=True, return_inverse=True)
+    unicos = valores[primeiros].tolist()
+    modelo = _modelo(casas, prefixo)
+    conhecidos = _conhecidos(modelo)
+    formatar = modelo.format
+    for valor in [v for v in unicos if v not in conhecidos]:
+        conhecidos[valor] = formatar(valor).replace('.', ',').replace('_', '.')
+    textos = np.array([conhecidos[v] for v in unicos], dtype=object)
+    for i in np.flatnonzero(valores[primeiros] == 0):
+        textos[i] = _texto(modelo, unicos[i])
+    return textos[inversos].reshape(arr.shape)
+
+
+def numero(valores, casas=2, prefixo=''):
+    """Número(s) com separador de milhar '.' e decimal ','; mesmo tipo de saída que a entrada."""
+    if np.ndim(valores) == 0:
+        return _formatar(valores, casas, prefixo)
+    if isinstance(valores, pd.Series):
+        return pd.Series(_formatar_array(valores.to_numpy(), casas, prefixo),
+                         index=valores.index, name=valores.name, dtype=object)
+    textos = _formatar_array(np.asarray(valores), casas, prefixo)
+    return textos.tolist() if isinstance(valores, (list, tuple)) else textos
+
+
+def moeda(valores, casas=2):
+    """Valor(es) em reais: 'R$ 1.234,56'."""
+    return numero(valores, casas, prefixo='R$ ')
@@ -0,0 +1,143 @@
+"""Gera planilhas sintéticas no mesmo formato das exportações do ERP.
+
+Uso: python dre/gerar_dados_sinteticos.py PASTA --linhas 100000 [--ano 2024] [--seed 42]
+
+As funções gerar_* também podem ser usadas direto (ex.: benchmark.py) para
+montar DataFrames grandes sem passar pelo Excel.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from datasets import SHEETS, Dataset
+
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+# Limite de linhas de uma planilha do Excel (sem o cabeçalho)
+EXCEL_MAX_LINHAS = 1_048_575
+
+# (conta, classificação, grupo)
+CONTAS = [
+    ('Salários e ordenados', 'Fixo', 'Despesas com folha'),
+    ('Pró-labore', 'Fixo', 'Despesas com folha'),
+    ('Aluguel', 'Fixo', 'Despesas administrativas'),
+    ('Energia elétrica', 'Fixo', 'Despesas administrativas'),
+    ('Internet e telefone', 'Fixo', 'Despesas administrativas'),
+    ('Compra de peças', 'Variável', 'Custo das mercadorias'),
+    ('Fretes', 'Variável', 'Despesas comerciais'),
+    ('Comissões', 'Variável', 'Despesas comerciais'),
+    ('Simples Nacional', 'Variável', 'Imposto'),
+    ('ICMS', 'Variável', 'Imposto'),
+    ('Juros e tarifas bancárias', 'Fixo', 'Despesas financeiras'),
+    ('Transferência entre contas', 'Fixo', 'Transferências'),
+]
+# Nomes antigos do plano de contas que o mapa converte para os novos
+CONTAS_ANTIGAS = {
+    'Energia': 'Energia elétrica',
+    'Telefone': 'Internet e telefone',
+    'Tarifas bancárias': 'Juros e tarifas bancárias',
+}
+CATEGORIAS_RECEBER = ['Venda de peças', 'Serviços de oficina', 'Venda de máquinas',
+                      'Desconto concedido', 'Devolução de venda']
+SETORES = ['Administrativo', 'Oficina', 'Peças', 'Máquinas', 'Comercial', 'Diretoria']
+
+
+def _datas(rng, n, ano):
+    dias = rng.integers(0, 365, n)
+    datas = (pd.Timestamp(ano, 1, 1) + pd.to_timedelta(dias, unit='D')).strftime('%d/%m/%Y')
+    return np.asarray(datas, dtype=object)
+
+
+def gerar_classificacao():
+    """Retorna (classif_df, map_df) como as duas abas do arquivo de classificação."""
+    classif_df = pd.DataFrame([(c, cl) for c, cl, _ in CONTAS], columns=['Conta', 'Classificação'])
+    map_df = pd.DataFrame(list(CONTAS_ANTIGAS.items()), columns=['contasantigas', 'contasnovas'])
+    return classif_df, map_df
+
+
+def gerar_contas_a_pagar(n, ano=2024, seed=0):
+    rng = np.random.default_rng(seed)
+    nomes = [c for c, _, _ in CONTAS] + list(CONTAS_ANTIGAS)
+    grupos = {c: g for c, _, g in CONTAS}
+    grupos.update({antiga: grupos[nova] for antiga, nova in CONTAS_ANTIGAS.items()})
+
+    idx = rng.integers(0, len(nomes), n)
+    codigos = rng.integers(100, 999, len(nomes))
+    categorias = np.array([f'{codigos[i]} {nome}' for i, nome in enumerate(nomes)], dtype=object)
+    return pd.DataFrame({
+        'Pagto': _datas(rng, n, ano),
+        'Categoria': categorias[idx],
+        'Valor': rng.lognormal(6.5, 1.2, n).round(2),
+        'Grupo': np.array([grupos[nome] for nome in nomes], dtype=object)[idx],
+        'Setor Cons.': rng.choice(SETORES, n),
+    })
+
+
+def gerar_contas_a_receber(n, ano=2024, seed=1):
+    rng = np.random.default_rng(seed)
+    categorias = rng.choice(CATEGORIAS_RECEBER, n, p=[0.45, 0.3, 0.15, 0.05, 0.05])
+    valores = rng.lognormal(7.5, 1.0, n).round(2)
+    # descontos e devoluções aparecem ora com sinal negativo, ora positivo
+    negativo = np.isin(categorias, CATEGORIAS_RECEBER[3:]) & (rng.random(n) < 0.7)
+    return pd.DataFrame({
+        'Pagto.': _datas(rng, n, ano),
+        'Categoria': categorias,
+        'Valor': np.where(negativo, -valores, valores),
+    })
+
+
+def gerar_faturamento(n, seed=2):
+    rng = np.random.default_rng(seed)
+    n_clientes = max(10, n // 20)
+    fat = pd.DataFrame({
+        'Cliente': [f'Cliente {i:06d}' for i in rng.integers(0, n_clientes, n)],
+        'Vendedor': rng.choice([f'Vendedor {i:02d}' for i in range(1, 16)], n),
+    })
+    for mes in MESES:
+        vendas = rng.lognormal(8, 1.1, n).round(2)
+        fat[mes] = np.where(rng.random(n) < 0.6, 0.0, vendas)
+    return fat
+
+
+def _gravar_abas(path, frames):
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        for sheet, df in frames.items():
+            df.to_excel(writer, sheet_name=sheet, index=False)
+
+
+def _dividir(df, sheets):
+    partes = np.array_split(np.arange(len(df)), len(sheets))
+    return {sheet: df.iloc[idx] for sheet, idx in zip(sheets, partes)}
+
+
+def gerar_planilhas(pasta, linhas, ano=2024, seed=42):
+    """Grava contas a pagar/receber, faturamento e classificação com `linhas` lançamentos cada."""
+    if linhas > EXCEL_MAX_LINHAS * len(SHEETS):
+        raise ValueError(f'{linhas} linhas não cabem em {len(SHEETS)} abas do Excel; '
+                         'use as funções gerar_* direto para volumes maiores.')
+    os.makedirs(pasta, exist_ok=True)
+    ds = Dataset.da_pasta(pasta, ano=ano)
+
+    classif_df, map_df = gerar_classificacao()
+    _gravar_abas(ds.caminho('classif'), {'Classificacao': classif_df, 'Mapa': map_df})
+    _gravar_abas(ds.caminho('apagar'), _dividir(gerar_contas_a_pagar(linhas, ano, seed), SHEETS))
+    _gravar_abas(ds.caminho('areceber'), _dividir(gerar_contas_a_receber(linhas, ano, seed + 1), SHEETS))
+    _gravar_abas(ds.caminho('faturamento'), _dividir(gerar_faturamento(linhas, seed + 2), SHEETS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pasta')
+    parser.add_argument('--linhas', type=int, default=10_000)
+    parser.add_argument('--ano', type=int, default=2024)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    gerar_planilhas(args.pasta, args.linhas, args.ano, args.seed)
+    print(f'Planilhas com {args.linhas} linhas gravadas em {args.pasta}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Figuras Plotly das páginas, montadas uma vez por (versão dos dados, página, filtro).
+
+A cada rerun as páginas pediam de novo o go.Figure (com os rótulos formatados ponto a
+ponto); aqui a figura pronta fica num cache do processo e só é remontada quando a
+fonte de dados muda de versão. Séries com mais pontos que DRE_GRAFICO_PONTOS (padrão
+500) são reduzidas no servidor antes de ir para o navegador, mantendo os extremos de
+cada intervalo, para que visões de vários anos ou diárias continuem leves.
+
+As figuras em cache são compartilhadas entre sessões: não devem ser alteradas in-place.
+"""
+import os
+
+import numpy as np
+
+from cache import CacheLRU
+
+PONTOS_MAX = int(os.environ.get('DRE_GRAFICO_PONTOS', 500))
+
+_cache = CacheLRU(int(os.environ.get('DRE_GRAFICO_CACHE', 256)))
+
+# Atributos por ponto que acompanham x/y quando a série é reduzida
+_POR_PONTO = ('text', 'hovertext', 'customdata')
+
+
+def indices_reduzidos(y, max_pontos=PONTOS_MAX):
+    """Índices a manter: mínimo e máximo de cada intervalo, mais o primeiro e o último ponto."""
+    n = len(y)
+    if n <= max_pontos:
+        return np.arange(n)
+    valores = np.asarray(y, dtype='float64')
+    limites = np.linspace(0, n, max((max_pontos - 2) // 2, 1) + 1).astype(int)
+    manter = [0, n - 1]
+    for ini, fim in zip(limites[:-1], limites[1:]):
+        if fim > ini:
+            trecho = valores[ini:fim]
+            if np.isnan(trecho).all():
+                manter.append(ini)
+                continue
+            manter += [ini + int(np.nanargmin(trecho)), ini + int(np.nanargmax(trecho))]
+    return np.unique(manter)
+
+
+def reduzir(fig, max_pontos=PONTOS_MAX):
+    """Reduz in-place as séries de linha (scatter) com mais de `max_pontos` pontos."""
+    for trace in fig.data:
+        if trace.type not in ('scatter', 'scattergl') or trace.y is None or len(trace.y) <= max_pontos:
+            continue
+        idx = indices_reduzidos(trace.y, max_pontos)
+        n = len(trace.y)
+        atualizacao = {'y': np.asarray(trace.y)[idx]}
+        if trace.x is not None and len(trace.x) == n:
+            atualizacao['x'] = np.asarray(trace.x)[idx]
+        for atributo in _POR_PONTO:
+            valor = trace[atributo]
+            if valor is not None and not isinstance(valor, str) and len(valor) == n:
+                atualizacao[atributo] = np.asarray(valor)[idx]
+        cores = trace.marker.color if 'marker' in trace else None
+        if cores is not None and not isinstance(cores, str) and len(cores) == n:
+            atualizacao['marker_color'] = np.asarray(cores)[idx]
+        trace.update(atualizacao)
+    return fig
+
+
+def figura(fonte, pagina, filtro, montar):
+    """go.Figure da `pagina` com `filtro`, montada por `montar()` só quando não está em cache."""
+    return _cache.get_or_build((fonte.versao(), pagina, filtro), lambda: reduzir(montar()))
+
+
+def invalidar_cache():
+    _cache.clear()
+
+
+def cache_info():
+    return _cache.info()
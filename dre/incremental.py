@@ -0,0 +1,86 @@
+"""Ingestão incremental dos lançamentos: só linhas novas ou alteradas passam pela preparação.
+
+Cada linha bruta recebe uma chave (hash do conteúdo + número da ocorrência, para
+lançamentos idênticos repetidos). Com o snapshot anterior em mãos, as linhas cuja
+chave já existe são reaproveitadas já preparadas e só o delta passa por montar_*.
+Linhas editadas no meio do ano viram "removida + nova", então não dependemos de
+uma marca d'água pela data de pagamento.
+
+O xlsx ainda é lido inteiro (o formato não permite ler só o final da planilha);
+o ganho está em merges, classificação e DRE, que passam a custar pelo delta.
+
+Desligar com DRE_INCREMENTAL=0.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import etapa
+from leitura import categorias_como_texto
+
+ATIVO = os.environ.get('DRE_INCREMENTAL', '1') != '0'
+
+# Coluna com a chave de cada linha nos frames preparados
+COLUNA_CHAVE = '_chave'
+
+
+def chaves_linhas(raw):
+    """Chave uint64 por linha: hash do conteúdo combinado com a ocorrência desse conteúdo."""
+    conteudo = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+    ocorrencia = pd.Series(conteudo).groupby(conteudo).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame({'h': conteudo, 'o': ocorrencia}), index=False).to_numpy()
+
+
+def _concatenar(a, b):
+    # Categóricas com categorias diferentes virariam object no concat: unifica antes
+    colunas = {}
+    for col in a.columns:
+        x, y = a[col].reset_index(drop=True), b[col].reset_index(drop=True)
+        if isinstance(x.dtype, pd.CategoricalDtype) and isinstance(y.dtype, pd.CategoricalDtype) \
+                and x.dtype != y.dtype:
+            # tipos diferentes (ex.: datas da leitura nova x texto do snapshot): compara como texto
+            x, y = categorias_como_texto(x), categorias_como_texto(y)
+            categorias = x.cat.categories.union(y.cat.categories)
+            x, y = x.cat.set_categories(categorias), y.cat.set_categories(categorias)
+        colunas[col] = pd.concat([x, y], ignore_index=True)
+    return pd.DataFrame(colunas)
+
+
+def mesclar(raw, anterior, montar):
+    """Frame preparado na ordem de `raw`, reaproveitando de `anterior` as linhas com a mesma chave.
+
+    `montar(raw)` prepara linhas brutas; é chamado só com as linhas novas. Sem
+    `anterior` (ou com colunas diferentes) prepara tudo.
+    """
+    chaves = chaves_linhas(raw)
+    posicoes = np.full(len(raw), -1) if anterior is None or COLUNA_CHAVE not in anterior \
+        else pd.Index(anterior[COLUNA_CHAVE]).get_indexer(chaves)
+    novas = posicoes < 0
+
+    if novas.all():
+        df = montar(raw)
+        df[COLUNA_CHAVE] = chaves
+        return df
+
+    with etapa('incremental', linhas=int(novas.sum())):
+        reaproveitadas = anterior.iloc[posicoes[~novas]]
+        if not novas.any():
+            return reaproveitadas.reset_index(drop=True)
+        delta = montar(raw[novas])
+        delta[COLUNA_CHAVE] = chaves[novas]
+        if list(delta.columns) != list(anterior.columns):
+            df = montar(raw)
+            df[COLUNA_CHAVE] = chaves
+            return df
+        df = _concatenar(reaproveitadas, delta)
+        # volta para a ordem da planilha: reaproveitadas vieram antes das novas
+        ordem = np.concatenate([np.flatnonzero(~novas), np.flatnonzero(novas)])
+        return df.iloc[np.argsort(ordem, kind='stable')].reset_index(drop=True)
+
+
+def meses_alterados(chaves_antes, meses_antes, chaves, meses):
+    """Meses (0 = sem data) com alguma linha nova ou removida entre duas versões."""
+    removidas = ~pd.Index(chaves_antes).isin(chaves)
+    novas = ~pd.Index(chaves).isin(chaves_antes)
+    return sorted(set(np.unique(meses_antes[removidas]).tolist()) | set(np.unique(meses[novas]).tolist()))
@@ -0,0 +1,139 @@
+"""Medição opcional do tempo de cada etapa (leitura do Excel, merges, DRE, gráficos, tabelas).
+
+Ativar com DRE_INSTRUMENTACAO=1. Com isso:
+- cada etapa vira uma linha de log JSON no logger "dre.timing";
+- o painel de debug aparece na sidebar (painel_sidebar);
+- com DRE_METRICS_PORT definido, /metrics expõe os acumulados no formato Prometheus
+  (só em 127.0.0.1; DRE_METRICS_HOST=0.0.0.0 para o Prometheus coletar de outra máquina).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ATIVO = os.environ.get('DRE_INSTRUMENTACAO') == '1'
+METRICS_PORT = os.environ.get('DRE_METRICS_PORT')
+METRICS_HOST = os.environ.get('DRE_METRICS_HOST', '127.0.0.1')
+
+logger = logging.getLogger('dre.timing')
+if ATIVO and not logger.handlers:
+    # Uma linha JSON por etapa no stderr, pronta para o coletor de logs
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_local = threading.local()   # etapas do render atual (cada sessão roda na sua thread)
+_lock = threading.Lock()
+_acumulado = {}              # etapa -> {count, seconds, max, linhas, bytes}
+_servidor = None
+
+
+def iniciar_render(pagina):
+    """Zera a lista de etapas da thread atual; chamar no começo de cada rerun."""
+    _local.pagina = pagina
+    _local.etapas = []
+
+
+def etapas_do_render():
+    return list(getattr(_local, 'etapas', []))
+
+
+@contextmanager
+def etapa(nome, **extras):
+    """Cronometra o bloco. O dict devolvido aceita 'linhas' e 'bytes' preenchidos dentro do bloco."""
+    if not ATIVO:
+        yield extras
+        return
+    inicio = time.perf_counter()
+    try:
+        yield extras
+    finally:
+        _registrar(nome, time.perf_counter() - inicio, extras)
+
+
+def _registrar(nome, segundos, extras):
+    registro = {'etapa': nome, 'pagina': getattr(_local, 'pagina', None),
+                'ms': round(segundos * 1000, 2), **extras}
+    if hasattr(_local, 'etapas'):
+        _local.etapas.append(registro)
+    with _lock:
+        acc = _acumulado.setdefault(nome, {'count': 0, 'seconds': 0.0, 'max': 0.0, 'linhas': 0, 'bytes': 0})
+        acc['count'] += 1
+        acc['seconds'] += segundos
+        acc['max'] = max(acc['max'], segundos)
+        acc['linhas'] += int(extras.get('linhas') or 0)
+        acc['bytes'] += int(extras.get('bytes') or 0)
+    logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def acumulado():
+    with _lock:
+        return {k: dict(v) for k, v in _acumulado.items()}
+
+
+# (métrica, campo do acumulado, tipo, descrição)
+_METRICAS = [
+    ('dre_etapa_segundos_total', 'seconds', 'counter', 'Tempo gasto por etapa.'),
+    ('dre_etapa_execucoes_total', 'count', 'counter', 'Execuções por etapa.'),
+    ('dre_etapa_segundos_max', 'max', 'gauge', 'Maior tempo de uma execução.'),
+    ('dre_etapa_linhas_total', 'linhas', 'counter', 'Linhas processadas por etapa.'),
+    ('dre_etapa_bytes_total', 'bytes', 'counter', 'Bytes lidos por etapa.'),
+]
+
+
+def exportar_prometheus():
+    """Acumulados por etapa no formato texto do Prometheus."""
+    dados = acumulado()
+    linhas = []
+    for metrica, campo, tipo, descricao in _METRICAS:
+        linhas += [f'# HELP {metrica} {descricao}', f'# TYPE {metrica} {tipo}']
+        for nome, acc in sorted(dados.items()):
+            linhas.append(f'{metrica}{{etapa="{nome}"}} {acc[campo]}')
+    return '\n'.join(linhas) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        corpo = exportar_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor_metricas(porta=None, host=None):
+    """Sobe (uma vez por processo) o endpoint /metrics numa thread daemon."""
+    global _servidor
+    porta = porta or METRICS_PORT
+    host = host or METRICS_HOST
+    if not ATIVO or not porta:
+        return None
+    with _lock:
+        if _servidor is None:
+            _servidor = ThreadingHTTPServer((host, int(porta)), _MetricsHandler)
+            threading.Thread(target=_servidor.serve_forever, daemon=True, name='dre-metrics').start()
+    return _servidor
+
+
+def painel_sidebar(st):
+    """Tabela com as etapas do render atual na sidebar."""
+    if not ATIVO:
+        return
+    etapas = etapas_do_render()
+    with st.sidebar.expander('⏱️ Tempos por etapa', expanded=False):
+        if etapas:
+            st.dataframe(etapas, use_container_width=True, hide_index=True)
+        else:
+            st.caption('Nenhuma etapa medida neste render.')
@@ -0,0 +1,126 @@
+from dataclasses import dataclass, fields
+
+from cache import CacheLRU
+from dados import CACHE_MAX_ENTRIES, CACHE_MAX_MB, carregar_contas, registrar_cache, versao_contas
+from datasets import resolver
+from incremental import COLUNA_CHAVE, meses_alterados
+from motor_dre import ANUAL, dre_de_somas, somas_mensais
+
+# Resultados por (versão dos dados, período); cada entrada é pequena
+_cache = CacheLRU(256)
+
+
+def _tamanho_somas(estado):
+    return sum(a.nbytes for a in (*estado['cpa'], *estado['cre'])) + int(estado['somas'].memory_usage().sum())
+
+
+# Últimas somas mensais por conjunto (empresa, ano, abas), com as chaves/meses das linhas que
+# as geraram; limitado como o cache de frames de dados.py e descartado junto com ele
+_ultimas_somas = registrar_cache(CacheLRU(CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_MB * 2**20,
+                                          tamanho=_tamanho_somas))
+
+
+@dataclass(frozen=True)
+class KPIs:
+    """Indicadores da DRE de um período (mês 1-12 ou ANUAL)."""
+    periodo: int
+    receita_total: float
+    deducoes: float
+    receita_liquida: float
+    impostos: float
+    custos_variaveis: float
+    lucro_bruto: float
+    custos_fixos: float
+    ebitda: float
+    despesas_financeiras: float
+    lucro_liquido: float
+    despesas_totais: float
+    margem_contribuicao: float  # em % da receita líquida
+    ponto_equilibrio: float
+
+    def as_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+# Colunas de calcular_dre -> campos de KPIs
+_COLUNAS = {
+    'Receita Total': 'receita_total',
+    'Deduções': 'deducoes',
+    'Receita Líquida': 'receita_liquida',
+    'Impostos': 'impostos',
+    'Custos Variáveis': 'custos_variaveis',
+    'Lucro Bruto': 'lucro_bruto',
+    'Custos Fixos': 'custos_fixos',
+    'EBITDA': 'ebitda',
+    'Despesas Financeiras': 'despesas_financeiras',
+    'Lucro Líquido': 'lucro_liquido',
+    'Despesas Totais': 'despesas_totais',
+    'Margem de Contribuição': 'margem_contribuicao',
+    'Ponto de Equilíbrio': 'ponto_equilibrio',
+}
+
+
+def dre_mensal(dataset=None):
+    """DRE de todos os meses + ANUAL, calculada uma vez por versão dos dados.
+
+    Regra única para todas as páginas: transferências entre contas ficam fora.
+    """
+    dataset = resolver(dataset)
+    versao = versao_contas(dataset)
+
+    def build():
+        cpa, cre = carregar_contas(dataset)
+        return dre_de_somas(_somas((dataset.chave, dataset.abas), versao, cpa, cre))
+
+    return _cache.get_or_build(('dre', versao), build)
+
+
+def _somas(chave, versao, cpa, cre):
+    """Somas mensais refazendo só os meses com linhas novas/removidas desde a última versão."""
+    anterior = _ultimas_somas.get(chave)
+    incremental = COLUNA_CHAVE in cpa and COLUNA_CHAVE in cre
+    # classificação nova muda as regras de todas as linhas: recalcula tudo
+    if anterior and incremental and anterior['classif'] == versao[-1]:
+        meses = sorted(set(meses_alterados(anterior['cpa'][0], anterior['cpa'][1],
+                                           cpa[COLUNA_CHAVE].to_numpy(), cpa['Mes'].to_numpy()))
+                       | set(meses_alterados(anterior['cre'][0], anterior['cre'][1],
+                                             cre[COLUNA_CHAVE].to_numpy(), cre['Mes'].to_numpy())))
+        somas = anterior['somas'].copy()
+        if meses:
+            parcial = somas_mensais(cpa[cpa['Mes'].isin(meses)], cre[cre['Mes'].isin(meses)],
+                                    excluir_transferencias=True)
+            somas.loc[meses] = parcial.loc[meses]
+    else:
+        somas = somas_mensais(cpa, cre, excluir_transferencias=True)
+
+    if incremental:
+        _ultimas_somas.put(chave, {
+            'classif': versao[-1],
+            'cpa': (cpa[COLUNA_CHAVE].to_numpy(), cpa['Mes'].to_numpy()),
+            'cre': (cre[COLUNA_CHAVE].to_numpy(), cre['Mes'].to_numpy()),
+            'somas': somas,
+        })
+    return somas
+
+
+def kpis_da_linha(linha, periodo):
+    """KPIs a partir de uma linha da DRE (mesmas colunas de calcular_dre)."""
+    valores = {campo: float(linha[coluna]) for coluna, campo in _COLUNAS.items()}
+    return KPIs(periodo=periodo, **valores)
+
+
+def calcular_kpis(periodo=ANUAL, dataset=None):
+    """KPIs de um mês (1-12) ou do ano inteiro (ANUAL)."""
+    def build():
+        return kpis_da_linha(dre_mensal(dataset).loc[periodo], periodo)
+
+    return _cache.get_or_build(('kpis', versao_contas(dataset), periodo), build)
+
+
+def invalidar_cache():
+    _cache.clear()
+    _ultimas_somas.clear()
+
+
+def cache_info():
+    return _cache.info()
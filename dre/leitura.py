@@ -0,0 +1,131 @@
+"""Leitura em streaming das abas do Excel, para exportações grandes (vários anos).
+
+O caminho padrão do pandas carrega a planilha inteira antes de montar o frame, e o
+pico de memória fica várias vezes maior que o frame final. Aqui o openpyxl abre em
+modo read-only e as linhas são lidas em blocos. Só as colunas pedidas entram, e cada
+bloco já vira um frame tipado: texto como category, números como float/int e datas
+como datetime64. O pico fica perto do tamanho do frame final mais um bloco.
+
+DRE_EXCEL_STREAMING=0 volta para pd.read_excel; DRE_EXCEL_BLOCO define o tamanho do bloco.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+STREAMING = os.environ.get('DRE_EXCEL_STREAMING', '1') != '0'
+TAMANHO_BLOCO = int(os.environ.get('DRE_EXCEL_BLOCO', 50_000))
+
+
+def _nomes(cabecalho):
+    # Mesmos nomes que o pd.read_excel daria (vazios viram "Unnamed: i", repetidos ganham ".n")
+    nomes, vistos = [], {}
+    for i, valor in enumerate(cabecalho):
+        nome = f'Unnamed: {i}' if valor is None else valor
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f'{nome}.{vistos[nome]}'
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def _tipar(serie):
+    if serie.dtype != object and not pd.api.types.is_string_dtype(serie.dtype):
+        return serie
+    tipo = pd.api.types.infer_dtype(serie, skipna=True)
+    if tipo in ('datetime', 'datetime64'):
+        return pd.to_datetime(serie)
+    if tipo in ('integer', 'floating', 'mixed-integer-float'):
+        return pd.to_numeric(serie)
+    if tipo == 'empty':
+        return serie.astype('float64')
+    if tipo in ('mixed', 'mixed-integer'):
+        # tipos misturados (ex.: células de data e datas digitadas como texto): tudo vira texto,
+        # para as categorias terem um tipo só aqui, no snapshot e na leitura incremental
+        serie = serie.where(serie.isna(), serie.astype(str))
+    # texto: poucos valores distintos, então category
+    return serie.astype('category')
+
+
+def categorias_como_texto(serie):
+    """Categórica com as categorias em texto; as que viram o mesmo texto são unificadas."""
+    categorias = serie.cat.categories
+    if len(categorias) == 0 or pd.api.types.infer_dtype(categorias) == 'string':
+        return serie
+    codigos_texto, textos = pd.factorize(categorias.astype(str))
+    codigos = serie.cat.codes.to_numpy()
+    codigos = np.where(codigos >= 0, codigos_texto[np.maximum(codigos, 0)], -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=textos), index=serie.index, name=serie.name)
+
+
+def _bloco(linhas, nomes):
+    df = pd.DataFrame.from_records(linhas, columns=nomes) if linhas else pd.DataFrame(columns=nomes)
+    return pd.DataFrame({col: _tipar(df[col]) for col in nomes})
+
+
+def _categorias_ordenadas(categorias):
+    try:
+        return categorias.sort_values()
+    except TypeError:  # tipos misturados não têm ordem
+        return categorias
+
+
+def concatenar(blocos):
+    """Concatena frames unificando as categorias (senão o concat devolveria object).
+
+    Colunas que faltam em algum bloco (ex.: aba sem um dos meses) ficam vazias nele,
+    como no pd.concat; a ordem é a da primeira aparição.
+    """
+    if len(blocos) == 1:
+        return blocos[0]
+    nomes = list(dict.fromkeys(col for b in blocos for col in b.columns))
+    colunas = {}
+    for col in nomes:
+        modelo = next(b[col] for b in blocos if col in b)
+        # vazio do mesmo tipo (int vira float, categórica fica sem valores), como o reindex faz
+        partes = [b[col] if col in b else modelo.iloc[:0].reindex(range(len(b))) for b in blocos]
+        if all(isinstance(p.dtype, pd.CategoricalDtype) for p in partes):
+            categorias = pd.Index(pd.unique(pd.concat([p.cat.categories.to_series() for p in partes])))
+            categorias = _categorias_ordenadas(categorias)
+            partes = [p.cat.set_categories(categorias) for p in partes]
+            colunas[col] = pd.concat(partes, ignore_index=True)
+        elif len({p.dtype for p in partes}) == 1:
+            colunas[col] = pd.concat(partes, ignore_index=True)
+        else:
+            # bloco com tipo diferente (ex.: um texto numa coluna de valores): junta como object
+            colunas[col] = _tipar(pd.concat([p.astype(object) for p in partes], ignore_index=True))
+    return pd.DataFrame(colunas)
+
+
+def ler_aba(path, aba, colunas=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê a aba `aba` (nome ou índice) em blocos, só com `colunas` (None = todas)."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[aba] if isinstance(aba, int) else wb[aba]
+        linhas = ws.iter_rows(values_only=True)
+        nomes = _nomes(next(linhas, ()))
+        indices = [i for i, nome in enumerate(nomes) if colunas is None or nome in colunas]
+        selecionadas = [nomes[i] for i in indices]
+
+        blocos, buffer = [], []
+        for linha in linhas:
+            if all(v is None for v in linha):
+                continue  # linhas em branco, como no read_excel
+            buffer.append(tuple(linha[i] if i < len(linha) else None for i in indices))
+            if len(buffer) >= tamanho_bloco:
+                blocos.append(_bloco(buffer, selecionadas))
+                buffer = []
+        if buffer or not blocos:
+            blocos.append(_bloco(buffer, selecionadas))
+    finally:
+        wb.close()
+    return concatenar(blocos)
+
+
+def ler_aba_pandas(path, aba, colunas=None):
+    """Caminho antigo (planilha inteira em memória), com a mesma projeção de colunas."""
+    usecols = None if colunas is None else (lambda nome: nome in colunas)
+    return pd.read_excel(path, sheet_name=aba, usecols=usecols)
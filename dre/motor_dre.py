@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from classificacao import FLAGS, combinacoes, regras_dre
+from instrumentacao import etapa
+
+# Índice da linha com o ano inteiro (inclui lançamentos sem data de pagamento)
+ANUAL = 0
+MESES_IDX = list(range(1, 13))
+
+# Rateio da folha entre custo variável e fixo
+FOLHA_PERC_VAR = 0.6
+FOLHA_PERC_FIX = 1 - FOLHA_PERC_VAR
+
+DRE_LINHAS = [
+    'Receita Total', 'Deduções', 'Receita Líquida',
+    'Impostos', 'Custos Variáveis', 'Lucro Bruto',
+    'Custos Fixos', 'EBITDA',
+    'Despesas Financeiras', 'Lucro Líquido'
+]
+# Linhas da DRE mais os indicadores derivados, na ordem das colunas de calcular_dre
+DRE_COLUNAS = DRE_LINHAS + ['Despesas Totais', 'Margem de Contribuição', 'Ponto de Equilíbrio']
+
+def _mes(df):
+    # Mês do pagamento; 0 para lançamentos sem data (só entram no anual)
+    if 'Mes' in df:
+        return df['Mes']
+    return df['DataPagamento'].dt.month.fillna(ANUAL).astype('int8')
+
+
+def _por_valor(serie, regra):
+    """Avalia `regra` (Series -> máscara) uma vez por valor distinto e espalha pelos códigos.
+
+    Com colunas categóricas isso custa O(categorias) em vez de O(linhas) em operações de texto.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, distintos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, distintos = pd.factorize(serie)
+    # último elemento representa o valor ausente (código -1)
+    valores = pd.Series(list(distintos) + [np.nan], dtype=object)
+    return pd.Series(regra(valores).to_numpy(dtype=bool)[codigos], index=serie.index)
+
+
+def _somas_receber(cre):
+    valor = cre['Valor']
+    desconto = _por_valor(cre['Categoria'], lambda s: s.str.contains('desconto|devolução', case=False, na=False))
+    linhas = pd.DataFrame({
+        'receita': valor.where(valor > 0, 0.0),
+        'deducoes': valor.abs().where(desconto, 0.0),
+    })
+    return linhas.groupby(_mes(cre)).sum()
+
+
+def _somas_pagar(cpa, excluir_transferencias):
+    # Regras avaliadas uma vez por combinação (conta, grupo, classificação); ver classificacao.py
+    codigos, tabela = combinacoes(cpa)
+    flags = regras_dre(tabela)
+    if excluir_transferencias:
+        flags.loc[flags['transferencia']] = False
+    marcas = flags[[f for f in FLAGS if f != 'transferencia']].to_numpy(dtype=float)
+
+    # soma de Valor por (mês, combinação) e depois por marcação: matriz 13 x combinações
+    n = len(tabela)
+    chave = _mes(cpa).to_numpy().astype(np.int64) * n + codigos
+    por_combinacao = np.bincount(chave, weights=cpa['Valor'].fillna(0.0).to_numpy(),
+                                 minlength=13 * n).reshape(13, n)
+    return pd.DataFrame(por_combinacao @ marcas, columns=[f for f in FLAGS if f != 'transferencia'])
+
+
+def somas_mensais(cpa, cre, excluir_transferencias=False):
+    """Somas por mês (0 a 12) que alimentam a DRE; aditivas, então podem ser refeitas só nos meses alterados."""
+    with etapa('dre', linhas=len(cpa) + len(cre)):
+        somas = pd.concat([_somas_receber(cre), _somas_pagar(cpa, excluir_transferencias)], axis=1)
+    return somas.reindex(range(ANUAL, 13)).fillna(0.0)
+
+
+def calcular_dre(cpa, cre, excluir_transferencias=False):
+    """DRE de todos os meses e do ano numa única passada sobre os lançamentos.
+
+    Retorna um DataFrame indexado por mês (1 a 12) mais a linha ANUAL (0), com as
+    colunas de DRE_LINHAS e os indicadores derivados (despesas totais, margem de
+    contribuição e ponto de equilíbrio).
+    """
+    return dre_de_somas(somas_mensais(cpa, cre, excluir_transferencias))
+
+
+def rateio_folha(variavel, fixo, folha, folha_perc_var=FOLHA_PERC_VAR):
+    """Custos variáveis e fixos com a folha rateada (`folha_perc_var` vai para o variável)."""
+    return variavel + folha * folha_perc_var, fixo + folha * (1 - folha_perc_var)
+
+
+def linhas_dre(receita, deducoes, custos_variaveis, custos_fixos, impostos, financeiras):
+    """Linhas e indicadores da DRE (colunas de DRE_COLUNAS) a partir dos totais.
+
+    Aceita Series ou arrays de qualquer formato (com broadcast): cenarios.py avalia
+    centenas de cenários numa chamada só, com a mesma regra das páginas.
+    """
+    receita_liquida = receita - deducoes
+    lucro_bruto = receita_liquida - impostos - custos_variaveis
+    gasto_total = custos_variaveis + custos_fixos + financeiras + impostos
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margem = np.where(receita_liquida != 0, lucro_bruto / receita_liquida * 100, 0.0)
+        ponto_equilibrio = np.where(margem != 0, custos_fixos / (margem / 100), 0.0)
+    return {
+        'Receita Total': receita,
+        'Deduções': deducoes,
+        'Receita Líquida': receita_liquida,
+        'Impostos': impostos,
+        'Custos Variáveis': custos_variaveis,
+        'Lucro Bruto': lucro_bruto,
+        'Custos Fixos': custos_fixos,
+        'EBITDA': lucro_bruto - custos_fixos,
+        'Despesas Financeiras': financeiras,
+        'Lucro Líquido': receita_liquida - gasto_total,
+        'Despesas Totais': gasto_total,
+        'Margem de Contribuição': margem,
+        'Ponto de Equilíbrio': ponto_equilibrio,
+    }
+
+
+def dre_de_somas(somas):
+    """Monta a DRE a partir das somas mensais (ver somas_mensais)."""
+    base = somas.loc[MESES_IDX].copy()
+    base.loc[ANUAL] = somas.sum()
+
+    desp_var, desp_fix = rateio_folha(base['variavel'], base['fixo'], base['folha'])
+    impostos = base['imposto'] + base['simples']
+    dre = pd.DataFrame(linhas_dre(base['receita'], base['deducoes'], desp_var, desp_fix,
+                                  impostos, base['financeiras']), index=base.index)
+    dre.index.name = 'mes'
+    return dre
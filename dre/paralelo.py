@@ -0,0 +1,70 @@
+"""Leitura das abas do Excel em paralelo, num pool de processos, para as cargas a frio.
+
+O parse do openpyxl é CPU-bound e segura o GIL, então cada aba vai para um processo.
+DRE_EXCEL_WORKERS define quantos (padrão: número de núcleos, até 4); 1 lê tudo em
+sequência no próprio processo, como antes.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+import leitura
+
+logger = logging.getLogger('dre.paralelo')
+
+WORKERS = int(os.environ.get('DRE_EXCEL_WORKERS', min(os.cpu_count() or 1, 4)))
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _ler_aba(path, aba, colunas=None):
+    if leitura.STREAMING:
+        return leitura.ler_aba(path, aba, colunas)
+    return leitura.ler_aba_pandas(path, aba, colunas)
+
+
+def _executor():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: não herda as threads do Streamlit (fork com threads pode travar)
+            _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _sequencial(tarefas, colunas):
+    return [_ler_aba(path, aba, colunas) for path, aba in tarefas]
+
+
+def ler_abas(tarefas, colunas=None):
+    """Lê [(arquivo, aba), ...], só com `colunas` (None = todas), e devolve os DataFrames na mesma ordem."""
+    if WORKERS <= 1 or len(tarefas) <= 1:
+        return _sequencial(tarefas, colunas)
+    try:
+        futuros = [_executor().submit(_ler_aba, path, aba, colunas) for path, aba in tarefas]
+        return [f.result() for f in futuros]
+    except (BrokenProcessPool, OSError) as e:
+        # ambiente sem suporte a processos (ou worker morto): segue em sequência
+        logger.warning('pool indisponível (%s); lendo em sequência', e)
+        _descartar_pool()
+        return _sequencial(tarefas, colunas)
+
+
+def abas(path):
+    """Nomes das abas de uma planilha."""
+    with pd.ExcelFile(path) as xls:
+        return xls.sheet_names
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import sys
+
+import pandas as pd
+
+from instrumentacao import etapa
+from leitura import categorias_como_texto
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # sem pyarrow os dados continuam vindo direto das planilhas
+    pa = None
+    feather = None
+
+logger = logging.getLogger('dre.snapshot')
+
+# Incrementar sempre que a preparação dos frames mudar, para descartar snapshots antigos
+SCHEMA_VERSION = 7
+
+
+def snapshot_dir(base_path):
+    return os.environ.get('DRE_SNAPSHOT_DIR', os.path.join(base_path, '.snapshots'))
+
+
+def _assinatura(fontes):
+    # Só nome, mtime e tamanho: o snapshot continua válido se a pasta mudar de lugar
+    assinatura = []
+    for path in fontes:
+        info = os.stat(path)
+        assinatura.append([os.path.basename(path), info.st_mtime_ns, info.st_size])
+    return {'schema': SCHEMA_VERSION, 'fontes': assinatura}
+
+
+def _tipar_para_arrow(df):
+    # Colunas do Excel com tipos misturados (ex.: datas e textos) viram texto
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = categorias_como_texto(df[col])
+        elif df[col].dtype == object:
+            tipo = pd.api.types.infer_dtype(df[col], skipna=True)
+            if tipo not in ('string', 'empty', 'datetime', 'date', 'boolean', 'floating', 'integer'):
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _ler(path_arquivo):
+    # Feather sem compressão pode ser mapeado em memória direto do disco
+    with etapa('snapshot', arquivo=os.path.basename(path_arquivo), bytes=os.path.getsize(path_arquivo)) as medida:
+        tabela = feather.read_table(path_arquivo, memory_map=True)
+        medida['linhas'] = tabela.num_rows
+        return tabela.to_pandas()
+
+
+def _gravar(df, path_arquivo, path_meta, assinatura):
+    os.makedirs(os.path.dirname(path_arquivo), exist_ok=True)
+    tmp = path_arquivo + '.tmp'
+    feather.write_feather(_tipar_para_arrow(df), tmp, compression='uncompressed')
+    os.replace(tmp, path_arquivo)
+    with open(path_meta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(assinatura, f)
+    os.replace(path_meta + '.tmp', path_meta)
+
+
+def _anterior(path_arquivo, assinatura_antiga, assinatura):
+    # Snapshot antigo serve de base incremental se só a primeira fonte (os lançamentos) mudou
+    if assinatura_antiga.get('schema') != assinatura['schema'] \
+            or assinatura_antiga.get('fontes', [])[1:] != assinatura['fontes'][1:]:
+        return None
+    try:
+        return _ler(path_arquivo)
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def carregar(nome, fontes, build, base_path, incremental=False):
+    """Lê o snapshot colunar `nome`; reconstrói com `build()` se alguma fonte mudou.
+
+    Com `incremental=True`, `build(anterior)` recebe o frame do snapshot antigo quando
+    só `fontes[0]` mudou (ver incremental.py), ou None para montar do zero.
+    """
+    if feather is None:
+        return build(None) if incremental else build()
+
+    pasta = snapshot_dir(base_path)
+    path_arquivo = os.path.join(pasta, f'{nome}.feather')
+    path_meta = os.path.join(pasta, f'{nome}.json')
+    assinatura = _assinatura(fontes)
+
+    assinatura_antiga = {}
+    try:
+        with open(path_meta, encoding='utf-8') as f:
+            assinatura_antiga = json.load(f)
+        if assinatura_antiga == assinatura:
+            return _ler(path_arquivo)
+    except OSError:
+        pass  # ainda sem snapshot
+    except (ValueError, pa.ArrowException) as e:
+        logger.warning('snapshot %s ilegível, relendo as planilhas: %s', nome, e)
+
+    if incremental:
+        df = build(_anterior(path_arquivo, assinatura_antiga, assinatura) if assinatura_antiga else None)
+    else:
+        df = build()
+    try:
+        _gravar(df, path_arquivo, path_meta, assinatura)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        # snapshot é só cache: sem ele a próxima carga volta às planilhas
+        logger.warning('não foi possível gravar o snapshot %s: %s', nome, e)
+    return df
+
+
+def main(pasta=None):
+    # Ingestão: `python dre/snapshot.py [pasta_dos_dados]` gera/atualiza os snapshots
+    # da pasta ou, sem argumento, de todos os conjuntos registrados (ver datasets.py)
+    import dados
+    import datasets
+
+    if feather is None:
+        sys.exit('pyarrow não está instalado; snapshots desativados.')
+    for ds in [datasets.resolver(pasta)] if pasta else datasets.listar():
+        dados.carregar_contas(ds)
+        dados.carregar_faturamento(ds)
+        print(f'{ds.empresa}/{ds.ano}: snapshots atualizados em {snapshot_dir(ds.pasta)}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
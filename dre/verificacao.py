@@ -0,0 +1,171 @@
+"""Verificações de regressão da leitura das planilhas e dos snapshots.
+
+Uso: python dre/verificacao.py [planilha.xlsx ...]
+
+- leitura em streaming (leitura.ler_aba) x pd.ExcelFile(...).parse, aba por aba, nas
+  planilhas sintéticas (com Pagto misto: células de data e datas digitadas como texto)
+  e nas planilhas passadas na linha de comando;
+- Pagto misto, edição da planilha e recarga (snapshot + incremental) várias vezes: as
+  datas e a DRE têm de bater com a leitura do zero;
+- abas com colunas diferentes (faturamento com um mês faltando numa aba e uma coluna só
+  na outra): leitura.concatenar x pd.concat e o faturamento preparado;
+- duas empresas nas mesmas planilhas, cada uma com a sua aba: DRE, KPIs e rankings dos
+  caches derivados têm de ser os de cada empresa.
+
+Sai com código 1 na primeira divergência.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import agregados
+import dados
+import kpis
+import leitura
+from datasets import SHEETS, Dataset
+from gerar_dados_sinteticos import (_dividir, _gravar_abas, gerar_contas_a_pagar,
+                                    gerar_faturamento, gerar_planilhas)
+from motor_dre import ANUAL, calcular_dre, dre_de_somas, somas_mensais
+
+
+class Divergencia(AssertionError):
+    pass
+
+
+def _valores(serie):
+    # Mesmos valores independentemente do tipo: category x object, texto ISO x célula de data
+    saida = []
+    for v in serie.astype(object):
+        if v is None or (not isinstance(v, str) and pd.isna(v)):
+            saida.append(None)
+        elif isinstance(v, datetime):
+            saida.append(str(pd.Timestamp(v)))
+        else:
+            saida.append(v)
+    return saida
+
+
+def comparar_leitura(path, colunas=None):
+    """Streaming x pandas em todas as abas de `path`; devolve o número de linhas comparadas."""
+    with pd.ExcelFile(path) as xls:
+        abas = xls.sheet_names
+        esperados = {aba: xls.parse(aba, usecols=None if colunas is None else (lambda n: n in colunas))
+                     for aba in abas}
+    linhas = 0
+    for aba in abas:
+        lido, esperado = leitura.ler_aba(path, aba, colunas), esperados[aba]
+        if list(lido.columns) != list(esperado.columns) or len(lido) != len(esperado):
+            raise Divergencia(f'{path}[{aba}]: colunas/linhas {list(lido.columns)} x {list(esperado.columns)}, '
+                              f'{len(lido)} x {len(esperado)}')
+        for col in esperado.columns:
+            if _valores(lido[col]) != _valores(esperado[col]):
+                raise Divergencia(f'{path}[{aba}]: coluna {col} diferente')
+            if col in ('Pagto', 'Pagto.'):
+                datas, datas_esperadas = dados._datas(lido[col]), dados._datas(esperado[col])
+                if not datas.reset_index(drop=True).equals(datas_esperadas.reset_index(drop=True)):
+                    raise Divergencia(f'{path}[{aba}]: datas de {col} diferentes')
+        linhas += len(lido)
+    return linhas
+
+
+def _pagto_misto(cpa):
+    # Parte das datas como célula de data do Excel, o resto como texto dd/mm/aaaa
+    cpa = cpa.copy()
+    cpa['Pagto'] = cpa['Pagto'].astype(object)
+    datas = cpa.index[::3]
+    cpa.loc[datas, 'Pagto'] = [datetime.strptime(s, '%d/%m/%Y') for s in cpa.loc[datas, 'Pagto']]
+    return cpa
+
+
+def verificar_pagto_misto(pasta, linhas=3000, edicoes=3):
+    """Pagto misto -> carga -> edições da planilha -> recargas, comparando com a leitura do zero."""
+    gerar_planilhas(pasta, linhas)
+    ds = Dataset.da_pasta(pasta)
+    cpa = _pagto_misto(gerar_contas_a_pagar(linhas))
+    for edicao in range(edicoes + 1):
+        if edicao:
+            # lançamentos novos no fim e um valor editado no meio do ano
+            cpa = pd.concat([cpa, _pagto_misto(gerar_contas_a_pagar(10, seed=edicao))], ignore_index=True)
+            cpa.loc[edicao * 7, 'Valor'] += 1.0
+        _gravar_abas(ds.caminho('apagar'), _dividir(cpa, SHEETS))
+        dados.invalidar_cache()
+        recarregado, cre = dados.carregar_contas(ds)
+
+        esperado = pd.to_datetime(cpa['Pagto'], dayfirst=True, errors='coerce').to_numpy()
+        if not np.array_equal(recarregado['DataPagamento'].to_numpy(), esperado):
+            raise Divergencia(f'edição {edicao}: DataPagamento diferente da planilha')
+        do_zero = dados.preparar_contas_a_pagar(ds.caminho('apagar'), ds.caminho('classif'))
+        if not np.allclose(calcular_dre(recarregado, cre).to_numpy(), calcular_dre(do_zero, cre).to_numpy()):
+            raise Divergencia(f'edição {edicao}: DRE da recarga incremental diferente da leitura do zero')
+    return ds
+
+
+def verificar_abas_com_colunas_diferentes(pasta, linhas=2000):
+    """Faturamento com 'Dezembro' só na primeira aba e 'Obs' só na segunda: união das colunas."""
+    path = os.path.join(pasta, 'faturamento_colunas.xlsx')
+    primeira, segunda = _dividir(gerar_faturamento(linhas), SHEETS).values()
+    segunda = segunda.drop(columns='Dezembro').assign(Obs='revisar')
+    _gravar_abas(path, dict(zip(SHEETS, (primeira, segunda))))
+
+    lido = leitura.concatenar([leitura.ler_aba(path, aba) for aba in SHEETS])
+    with pd.ExcelFile(path) as xls:
+        esperado = pd.concat([xls.parse(aba) for aba in SHEETS], ignore_index=True)
+    if list(lido.columns) != list(esperado.columns):
+        raise Divergencia(f'colunas {list(lido.columns)} x {list(esperado.columns)}')
+    for col in esperado.columns:
+        if _valores(lido[col]) != _valores(esperado[col]):
+            raise Divergencia(f'abas com colunas diferentes: coluna {col} diferente')
+    longo = dados.preparar_faturamento(path)
+    if not np.isclose(longo['Valor'].sum(), np.nansum(esperado[dados.MESES].to_numpy())):
+        raise Divergencia('abas com colunas diferentes: total do faturamento diferente')
+
+
+def verificar_empresas_por_aba(pasta):
+    """Dois conjuntos nas mesmas planilhas, um por aba: nada dos caches derivados pode ser dividido."""
+    conjuntos = [Dataset('TeutoCar', 2024, pasta, abas=('teutocar',)),
+                 Dataset('TeutoMaq', 2024, pasta, abas=('teutomaq',))]
+    if dados.versao_contas(conjuntos[0]) == dados.versao_contas(conjuntos[1]):
+        raise Divergencia('versao_contas igual para abas diferentes')
+    lucros = []
+    for ds in conjuntos:
+        cpa, cre = dados.carregar_contas(ds)
+        esperado = dre_de_somas(somas_mensais(cpa, cre, excluir_transferencias=True))
+        fonte = agregados.FontePlanilhas(ds)
+        if not np.allclose(kpis.dre_mensal(ds).to_numpy(), esperado.to_numpy()):
+            raise Divergencia(f'{ds.empresa}: dre_mensal de outro conjunto')
+        if not np.isclose(fonte.kpis(ANUAL).lucro_liquido, esperado.loc[ANUAL, 'Lucro Líquido']):
+            raise Divergencia(f'{ds.empresa}: KPIs de outro conjunto')
+        centros = agregados.centros_de_custo(cpa)
+        anual = centros[centros['month'] == ANUAL]
+        if not np.allclose(fonte.top_centros(ANUAL, len(anual)).to_numpy(), anual['value'].to_numpy()):
+            raise Divergencia(f'{ds.empresa}: centros de custo de outro conjunto')
+        lucros.append(esperado.loc[ANUAL, 'Lucro Líquido'])
+    if np.isclose(lucros[0], lucros[1]):
+        raise Divergencia('abas das duas empresas com o mesmo resultado: caso não verifica nada')
+
+
+def main(planilhas):
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            ds = verificar_pagto_misto(pasta)
+            print(f'pagto misto + edições + recarga: ok ({ds.caminho("apagar")})')
+            verificar_abas_com_colunas_diferentes(pasta)
+            print('abas com colunas diferentes: ok')
+            verificar_empresas_por_aba(pasta)
+            print('duas empresas, uma aba cada: ok')
+            for tipo in ('apagar', 'areceber', 'classif', 'faturamento'):
+                print(f'streaming x pandas ({tipo}): {comparar_leitura(ds.caminho(tipo))} linhas ok')
+        for path in planilhas:
+            print(f'streaming x pandas ({os.path.basename(path)}): {comparar_leitura(path)} linhas ok')
+    except Divergencia as e:
+        print(f'DIVERGÊNCIA: {e}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
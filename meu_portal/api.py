@@ -0,0 +1,269 @@
+"""API HTTP local (JSON) com os números da DRE e do faturamento, sem Streamlit.
+
+    python meu_portal/api.py [--host 127.0.0.1] [--porta 8502] [--database-url URL]
+
+Usa o mesmo cálculo em cache das páginas (fonte_agregados: Postgres materializado ou
+planilhas) e os usuários da tabela `users`:
+
+    POST /api/token        {"email": ..., "password": ...} -> {"token": ..., "expires_in": ...}
+    GET  /api/datasets     conjuntos (empresa, ano) registrados
+    GET  /api/dre          ?empresa=&ano=            DRE mensal (mes 0 = anual)
+    GET  /api/kpis         ?empresa=&ano=&mes=&n=    KPIs do período e top-N centros de custo
+    GET  /api/faturamento  ?empresa=&ano=&mes=&n=    resumo, top-N vendedores/clientes e evolução
+
+Os GET pedem `Authorization: Bearer <token>` (o mesmo token assinado das sessões do
+portal, validado sem ir ao banco a cada chamada). As respostas levam um ETag derivado da
+versão dos dados: com `If-None-Match` igual a resposta é 304, sem recalcular nada.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy import text
+
+from db import make_engine
+from senhas import needs_rehash, rehash_in_background, verify_password
+import sessao
+
+DRE_DIR = os.environ.get(
+    "DRE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dre"))
+sys.path.insert(0, os.path.abspath(DRE_DIR))
+import datasets
+from agregados import fonte_agregados
+from cache import CacheLRU
+from motor_dre import ANUAL, DRE_COLUNAS, MESES_IDX
+
+TOP_N_MAX = 50
+
+logger = logging.getLogger("portal.api")
+
+# Corpos JSON prontos por ETag (a versão dos dados está dentro do ETag)
+_respostas = CacheLRU(int(os.environ.get("PORTAL_API_CACHE", 256)))
+
+
+class ErroApi(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# ————————————————————————————— Consultas —————————————————————————————
+def _numero(valor):
+    valor = float(valor)
+    return None if math.isnan(valor) or math.isinf(valor) else valor
+
+
+def _ranking(serie, rotulo):
+    return [{rotulo: str(nome), "valor": _numero(valor)} for nome, valor in serie.items()]
+
+
+def consulta_dre(fonte, params):
+    dre = fonte.dre().loc[[ANUAL] + MESES_IDX, DRE_COLUNAS]
+    return {"linhas": DRE_COLUNAS,
+            "meses": [{"mes": int(mes), **{col: _numero(v) for col, v in linha.items()}}
+                      for mes, linha in dre.iterrows()]}
+
+
+def consulta_kpis(fonte, params):
+    mes, n = params["mes"], params["n"]
+    kpis = {k: _numero(v) if k != "periodo" else v for k, v in fonte.kpis(mes).as_dict().items()}
+    return {"mes": mes, "kpis": kpis, "top_centros": _ranking(fonte.top_centros(mes, n), "centro")}
+
+
+def consulta_faturamento(fonte, params):
+    mes, n = params["mes"], params["n"]
+    resumo = fonte.resumo_faturamento(mes)
+    total, vendas, clientes = float(resumo["total"]), int(resumo["sales"]), int(resumo["clients"])
+    return {
+        "mes": mes,
+        "total": _numero(total),
+        "vendas": vendas,
+        "clientes": clientes,
+        "ticket_medio_venda": _numero(total / vendas) if vendas else 0.0,
+        "ticket_medio_cliente": _numero(total / clientes) if clientes else 0.0,
+        "top_vendedores": _ranking(fonte.top_faturamento(mes, "vendedor", n), "vendedor"),
+        "top_clientes": _ranking(fonte.top_faturamento(mes, "cliente", n), "cliente"),
+        "evolucao": [_numero(v) for v in fonte.evolucao_faturamento()],
+    }
+
+
+ROTAS = {
+    "/api/dre": consulta_dre,
+    "/api/kpis": consulta_kpis,
+    "/api/faturamento": consulta_faturamento,
+}
+
+
+def _parametros(query):
+    valores = {k: v[-1] for k, v in parse_qs(query).items()}
+    try:
+        mes = valores.get("mes", "anual")
+        mes = ANUAL if mes.lower() == "anual" else int(mes)
+        n = int(valores.get("n", 5))
+        ano = int(valores["ano"]) if valores.get("ano") else None
+    except ValueError:
+        raise ErroApi(400, "mes, ano e n devem ser inteiros")
+    if mes not in [ANUAL] + MESES_IDX:
+        raise ErroApi(400, "mes deve ser 1-12 ou 'anual'")
+    if not 1 <= n <= TOP_N_MAX:
+        raise ErroApi(400, f"n deve estar entre 1 e {TOP_N_MAX}")
+    try:
+        dataset = datasets.obter(valores.get("empresa"), ano)
+    except KeyError as e:
+        raise ErroApi(404, str(e.args[0]))
+    return dataset, {"mes": mes, "n": n}
+
+
+# ————————————————————————————— Autenticação —————————————————————————————
+def emitir_token(engine, email, senha):
+    """Token de sessão para e-mail/senha válidos de um usuário ativo (mesmas regras do login)."""
+    if sessao.login_bloqueado(email):
+        raise ErroApi(429, "muitas tentativas; tente mais tarde")
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT id, name, role, is_active, password_hash FROM users "
+                 "WHERE email=:e AND is_active=TRUE"),
+            {"e": email}
+        ).mappings().fetchone()
+    if not (row and verify_password(senha, row["password_hash"])):
+        sessao.registrar_falha(email)
+        raise ErroApi(401, "e-mail ou senha incorretos")
+    if needs_rehash(row["password_hash"]):
+        rehash_in_background(engine, row["id"], senha)
+    sessao.limpar_tentativas(email)
+    sessao.lembrar_usuario({k: row[k] for k in ("id", "name", "role", "is_active")})
+    return sessao.emitir_token(row["id"])
+
+
+# ————————————————————————————— HTTP —————————————————————————————
+class _Handler(BaseHTTPRequestHandler):
+    engine = None
+
+    def _json(self, status, corpo, etag=None):
+        dados = corpo if isinstance(corpo, bytes) else json.dumps(corpo, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "private, no-cache")
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _erro(self, erro):
+        self._json(erro.status, {"erro": str(erro)})
+
+    def _erro_interno(self):
+        # Planilha faltando/corrompida, banco fora etc.: 500 em JSON em vez de derrubar a conexão
+        logger.exception("erro em %s %s", self.command, self.path)
+        self._json(500, {"erro": "erro interno"})
+
+    def _usuario(self):
+        autorizacao = self.headers.get("Authorization", "")
+        if not autorizacao.startswith("Bearer "):
+            raise ErroApi(401, "Authorization: Bearer <token> obrigatório")
+        user = sessao.usuario_da_sessao(self.engine, autorizacao[len("Bearer "):].strip())
+        if user is None:
+            raise ErroApi(401, "token inválido ou expirado")
+        return user
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            self._usuario()
+            if url.path == "/api/datasets":
+                self._json(200, [{"empresa": d.empresa, "ano": d.ano} for d in datasets.listar()])
+                return
+            if url.path not in ROTAS:
+                raise ErroApi(404, "rota desconhecida")
+            dataset, params = _parametros(url.query)
+            fonte = fonte_agregados(self.engine, dataset)
+            chave = repr((fonte.versao(), url.path, sorted(params.items())))
+            etag = f'"{hashlib.sha1(chave.encode()).hexdigest()}"'
+            if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            def montar():
+                corpo = {"empresa": fonte.empresa, "ano": fonte.ano, **ROTAS[url.path](fonte, params)}
+                return json.dumps(corpo, ensure_ascii=False).encode()
+
+            self._json(200, _respostas.get_or_build(etag, montar), etag)
+        except ErroApi as e:
+            self._erro(e)
+        except Exception:
+            self._erro_interno()
+
+    def do_POST(self):
+        try:
+            if urlsplit(self.path).path != "/api/token":
+                raise ErroApi(404, "rota desconhecida")
+            try:
+                tamanho = int(self.headers.get("Content-Length", 0))
+                dados = json.loads(self.rfile.read(tamanho) or b"{}")
+                email, senha = str(dados["email"]), str(dados["password"])
+            except (ValueError, KeyError, TypeError):
+                raise ErroApi(400, 'corpo JSON {"email": ..., "password": ...} obrigatório')
+            token = emitir_token(self.engine, email, senha)
+            self._json(200, {"token": token, "expires_in": sessao.SESSION_TTL})
+        except ErroApi as e:
+            self._erro(e)
+        except Exception:
+            self._erro_interno()
+
+    def log_message(self, formato, *args):
+        sys.stderr.write(f"[api] {time.strftime('%H:%M:%S')} {self.address_string()} {formato % args}\n")
+
+
+def servidor(engine, host="127.0.0.1", porta=8502):
+    handler = type("Handler", (_Handler,), {"engine": engine})
+    return ThreadingHTTPServer((host, porta), handler)
+
+
+def _configuracao():
+    # Mesmo secrets.toml do portal: [postgres] para o banco e [session] para o segredo dos tokens
+    import tomllib
+
+    padrao = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+    try:
+        with open(os.environ.get("PORTAL_SECRETS", padrao), "rb") as f:
+            return tomllib.load(f)
+    except OSError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON da DRE e do faturamento.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=int(os.environ.get("PORTAL_API_PORT", 8502)))
+    parser.add_argument("--database-url", help="URL SQLAlchemy (padrão: seção [postgres] do secrets.toml)")
+    args = parser.parse_args()
+
+    config = _configuracao()
+    url = args.database_url or os.environ.get("DRE_DATABASE_URL")
+    if url or "postgres" in config:
+        # Mesmo pool do portal (ajustes da seção [postgres], se houver)
+        engine = make_engine(config.get("postgres", {}), url)
+    else:
+        sys.exit("sem banco: informe --database-url ou a seção [postgres] do secrets.toml")
+    sessao.configure(config.get("session", {}).get("secret"))
+
+    http = servidor(engine, args.host, args.porta)
+    print(f"API em http://{args.host}:{args.porta}/api/")
+    try:
+        http.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,31 @@
 import streamlit as st
 import pandas as pd
-import bcrypt
 import base64
-from sqlalchemy import create_engine, text
-from docx import Document
+from sqlalchemy import text
 import time
 
 # ─── NOVO IMPORT PARA OPÇÃO 2 ───────────────────────────────────────────────
 import importlib.util
 import os
+import sys
+
+from db import make_engine, pool_stats
+from senhas import hash_password, needs_rehash, rehash_in_background, verify_password
+from senhas import metrics as bcrypt_metrics
+import relatorios
+import sessao
+
+# Caminho do dash (relativo ao portal por padrão, configurável por variável de ambiente)
+DRE_PATH = os.environ.get(
+    "DRE_DASH_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dre", "dash_dre_v2.py"),
+)
+# Módulos compartilhados com o dash DRE (instrumentação de tempos)
+sys.path.insert(0, os.path.dirname(os.path.abspath(DRE_PATH)))
+import aquecimento
+import datasets
+import instrumentacao
+from instrumentacao import etapa
 
 
 
@@ -38,13 +55,10 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ————————————————————————————— Helpers —————————————————————————————
+@st.cache_resource(show_spinner=False)
 def get_engine():
-    db = st.secrets["postgres"]
-    url = (
-        f"postgresql://{db['user']}:{db['password']}"
-        f"@{db['host']}:{db['port']}/{db['dbname']}"
-    )
-    return create_engine(url)
+    # Um único engine (e pool de conexões) por processo, compartilhado por todas as sessões
+    return make_engine(st.secrets["postgres"])
 
 def logout_and_notify():
     st.session_state.clear()
@@ -55,21 +69,28 @@ def logout_and_notify():
 
 
 # ─── FUNÇÃO QUE CARREGA E EXECUTA O DASH EXTERNO ────────────────────────────
-def load_and_run_dre(engine, uid, page="Dashboard Geral"):
-    dre_path = r"C:\Users\sergi\Desktop\Yugen-projetos\dre\dash_dre_v2.py"
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_dre_module(dre_path, mtime):
+    # Executado uma vez por processo; só recarrega quando o arquivo muda (mtime na chave)
     spec = importlib.util.spec_from_file_location("dash_dre_v2", dre_path)
     module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules["dash_dre_v2"] = module
+    return module
 
-    # Monkey-patch para evitar erro de set_page_config duplicado
-    original_set = st.set_page_config
-    st.set_page_config = lambda *args, **kwargs: None
-    try:
-        spec.loader.exec_module(module)
-    finally:
-        st.set_page_config = original_set  # restaura
-
-    # Agora chama o main do dash externo com 3 argumentos
-    module.main(engine, uid, page)
+def load_and_run_dre(engine, uid, page="Dashboard Geral"):
+    dre_path = os.path.abspath(DRE_PATH)
+    with etapa("dre_modulo"):
+        module = _load_dre_module(dre_path, os.path.getmtime(dre_path))
+
+    # Empresa/ano escolhidos na sidebar (None = primeiro conjunto registrado)
+    empresa = st.session_state.get("company_choice")
+    if empresa not in datasets.empresas():
+        empresa = None
+    ano = st.session_state.get("year_choice")
+    if empresa is None or ano not in datasets.anos(empresa):
+        ano = None
+    module.main(engine, uid, page, empresa=empresa, ano=ano)
 
 # ————————————————————————————— Signup —————————————————————————————
 def show_signup(engine):
@@ -84,7 +105,7 @@ def show_signup(engine):
             if conn.execute(text("SELECT 1 FROM users WHERE email=:e"), {"e": email}).fetchone():
                 st.error("E-mail já cadastrado.")
                 return
-            pwd_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+            pwd_hash = hash_password(password)
             conn.execute(
                 text("INSERT INTO users (email,name,password_hash,role,is_active) VALUES (:e,:n,:ph,'client',FALSE)"),
                 {"e": email, "n": name, "ph": pwd_hash}
@@ -130,22 +151,37 @@ def show_login(engine):
         email = st.session_state.login_email
         pwd   = st.session_state.login_pwd
 
+        # muitas falhas seguidas: recusa sem consultar o banco nem rodar bcrypt
+        espera = sessao.login_bloqueado(email)
+        if espera:
+            st.error(f"Muitas tentativas. Tente novamente em {espera} segundos.")
+            return
+
         # executa a verificação no banco
-        with engine.connect() as conn:
+        with etapa("login_db"), engine.connect() as conn:
             row = conn.execute(
-                text("SELECT id, name, password_hash "
+                text("SELECT id, name, role, is_active, password_hash "
                      "FROM users "
                      "WHERE email=:e AND is_active=TRUE"),
                 {"e": email}
             ).mappings().fetchone()
 
-        if row and bcrypt.checkpw(pwd.encode(), row["password_hash"].encode()):
+        with etapa("bcrypt"):
+            senha_ok = bool(row) and verify_password(pwd, row["password_hash"])
+
+        if senha_ok:
+            if needs_rehash(row["password_hash"]):
+                rehash_in_background(engine, row["id"], pwd)
+            sessao.limpar_tentativas(email)
+            sessao.lembrar_usuario({k: row[k] for k in ("id", "name", "role", "is_active")})
+            st.session_state.auth_token = sessao.emitir_token(row["id"])
             st.session_state.user_id   = row["id"]
             st.session_state.user_name = row["name"]
             st.success(f"Bem-vindo, {row['name']}!")
             st.session_state.page = "Dashboard"
             st.rerun()
         else:
+            sessao.registrar_falha(email)
             st.error("E-mail ou senha incorretos.")
 
 
@@ -159,7 +195,8 @@ def show_dashboard_financeiro(engine, uid):
         # Renderiza as páginas do dash financeiro conforme a escolha
         subpage = st.radio(
             "Navegar entre as páginas:",
-            ["Dashboard Geral", "Análise de Faturamento", "DRE Trimestral", "DRE Completo", "Relatório Executivo"]
+            ["Dashboard Geral", "Análise de Faturamento", "DRE Trimestral", "DRE Completo", "Relatório Executivo",
+             "Simulação de Cenários"]
         )
 
         # Chama o dash externo com a subpágina
@@ -212,10 +249,21 @@ def show_report_diagnostico(engine, uid):
         cols = st.columns([9,1])
         if cols[1].button("🚪 Logout"):
             logout_and_notify()
-    st.title("📑 Diagnóstico Trimestral TeutoMaq")
-    doc = Document("Diagnostico_Trimestral_TeutoMaq.docx")
-    for p in doc.paragraphs:
-        if p.text.strip(): st.write(p.text)
+    # Relatórios registrados por empresa/trimestre (ver relatorios.py); o .docx é convertido
+    # uma vez por conteúdo e a página mostra o HTML pronto num único elemento
+    empresa = st.session_state.get("company_choice")
+    if empresa not in {r.empresa for r in relatorios.listar()}:
+        empresa = None
+    trimestres = relatorios.trimestres(empresa) if empresa else []
+    trimestre = st.selectbox("Trimestre", trimestres, key="quarter_choice") if len(trimestres) > 1 else None
+    relatorio = relatorios.obter(empresa, trimestre)
+    if relatorio is None:
+        st.title("📑 Diagnóstico Trimestral")
+        st.info("Nenhum diagnóstico disponível.")
+    else:
+        st.title(f"📑 Diagnóstico Trimestral {relatorio.empresa} {relatorio.trimestre}".rstrip())
+        with etapa("diagnostico"):
+            st.markdown(relatorios.html_do_relatorio(relatorio.caminho), unsafe_allow_html=True)
     if st.button("← Voltar"):
         st.session_state.page = "Dashboard"
         del st.session_state.report_choice
@@ -223,9 +271,24 @@ def show_report_diagnostico(engine, uid):
 
 # ————————————————————————————— Main —————————————————————————————
 def main():
+    instrumentacao.iniciar_render(st.session_state.get("page", "Login"))
+    instrumentacao.iniciar_servidor_metricas()
     engine = get_engine()
+    # recalcula os caches da DRE em segundo plano quando as planilhas mudam (DRE_AQUECIMENTO=0 desliga)
+    aquecimento.iniciar(engine)
+    sessao.configure(st.secrets.get("session", {}).get("secret"))
     sidebar = st.sidebar
 
+    # valida a sessão pelo token assinado + cache de usuários (sem ir ao banco a cada rerun)
+    if st.session_state.get("user_id"):
+        with etapa("sessao"):
+            user = sessao.usuario_da_sessao(engine, st.session_state.get("auth_token"))
+        if user is None:
+            st.session_state.clear()
+            st.session_state.page = "Login"
+        else:
+            st.session_state.user_role = user["role"]
+
     # logo
     logo = base64.b64encode(open("logo_yugen.png","rb").read()).decode()
     sidebar.markdown(f'<div style="text-align:center;"><img src="data:image/png;base64,{logo}" width="150"></div>', unsafe_allow_html=True)
@@ -266,13 +329,19 @@ def main():
     else:
         # Após login: mostrar empresa, dashboards e logout
         sidebar.markdown("<strong>Selecione a Empresa</strong>", unsafe_allow_html=True)
-        empresa = sidebar.selectbox("", ["– selecione –", "TeutoMaq"], key="company_choice")
+        empresa = sidebar.selectbox("", ["– selecione –"] + datasets.empresas(), key="company_choice")
 
         if empresa != "– selecione –":
+            anos = datasets.anos(empresa)
+            if len(anos) > 1:
+                sidebar.selectbox("Ano", anos, key="year_choice")
+            else:
+                st.session_state.year_choice = anos[0]
             sidebar.markdown("<strong style='margin-top:0.5rem;'>Dashboards e Análises</strong>", unsafe_allow_html=True)
             sidebar.selectbox(
                 "", 
-                ["– selecione –", "Dashboard Geral", "Análise de Faturamento", "DRE Trimestral", "DRE Completo"], 
+                ["– selecione –", "Dashboard Geral", "Análise de Faturamento", "DRE Trimestral", "DRE Completo",
+                 "Simulação de Cenários"], 
                 key="dashboard_choice"
             )
 
@@ -280,6 +349,10 @@ def main():
         sidebar.markdown("---")
         if sidebar.button("🚪 Logout"):
             logout_and_notify()
+
+        # Estatísticas do pool (ativar com PORTAL_SHOW_POOL_STATS=1)
+        if os.environ.get("PORTAL_SHOW_POOL_STATS") == "1":
+            sidebar.caption(f"Pool DB: {pool_stats(engine)['status']}")
             
         # render
     
@@ -302,6 +375,8 @@ def main():
             load_and_run_dre(engine, uid, page="DRE Completo")
         elif dash == "Relatório Executivo":
             load_and_run_dre(engine, uid, page="Relatório Executivo")
+        elif dash == "Simulação de Cenários":
+            load_and_run_dre(engine, uid, page="Simulação de Cenários")
 
         elif dash == "Comercial":
             show_dashboard_comercial(engine, uid)
@@ -312,5 +387,13 @@ def main():
         elif rpt == "Diagnóstico Trimestral":
             show_report_diagnostico(engine, uid)
 
+    # painel de debug (DRE_INSTRUMENTACAO=1)
+    instrumentacao.painel_sidebar(st)
+    if instrumentacao.ATIVO:
+        with sidebar.expander("🔌 Pool DB / bcrypt", expanded=False):
+            st.json({"pool": pool_stats(engine), "bcrypt": bcrypt_metrics()})
+        with sidebar.expander("🔥 Aquecimento dos caches", expanded=False):
+            st.json(aquecimento.relatorio())
+
 if __name__=="__main__":
     main()
@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine
+
+# Valores padrão do pool; cada um pode ser sobrescrito na seção [postgres] do secrets.toml
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+}
+
+
+def build_url(db):
+    return (
+        f"postgresql+psycopg2://{db['user']}:{db['password']}"
+        f"@{db['host']}:{db['port']}/{db['dbname']}"
+    )
+
+
+def make_engine(db, url=None):
+    """Cria o engine com pool a partir da config do Postgres (dict ou st.secrets).
+
+    Com `url`, conecta nela em vez de montar a URL da config, mas com o mesmo pool.
+    """
+    opts = {k: db.get(k, v) for k, v in POOL_DEFAULTS.items()}
+    return create_engine(url or build_url(db), **opts)
+
+
+def pool_stats(engine):
+    """Uso atual do pool de conexões, para dimensionar pool_size/max_overflow."""
+    pool = engine.pool
+    stats = {"status": pool.status()}
+    for nome in ("size", "checkedin", "checkedout", "overflow"):
+        metodo = getattr(pool, nome, None)
+        if metodo is not None:
+            stats[nome] = metodo()
+    return stats
@@ -0,0 +1,193 @@
+"""Diagnósticos trimestrais (.docx) convertidos uma vez para HTML e guardados em cache.
+
+Registro: os arquivos `Diagnostico_Trimestral_<Empresa>[_<AAAA>-T<n>].docx` da pasta
+PORTAL_RELATORIOS_DIR (padrão: a pasta do portal). Sem trimestre no nome, o relatório
+vale como o único (ou o mais antigo) da empresa.
+
+A conversão (títulos, listas, negrito/itálico, tabelas e imagens embutidas em base64)
+roda só quando o conteúdo do arquivo muda: o HTML fica em memória e em disco
+(.relatorios_cache/<sha256>.html), indexado pelo hash do arquivo, e a página o mostra
+num único elemento.
+"""
+import base64
+import hashlib
+import html
+import os
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+RELATORIOS_DIR = os.environ.get("PORTAL_RELATORIOS_DIR", os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get("PORTAL_RELATORIOS_CACHE", os.path.join(RELATORIOS_DIR, ".relatorios_cache"))
+
+# Incrementar quando a conversão mudar, para descartar o HTML já gravado
+VERSAO_CONVERSAO = 1
+
+_PADRAO = re.compile(r"^Diagnostico_Trimestral_(?P<empresa>.+?)(?:_(?P<trimestre>\d{4}-T[1-4]))?\.docx$", re.I)
+
+
+@dataclass(frozen=True)
+class Relatorio:
+    empresa: str
+    trimestre: str  # "AAAA-Tn"; "" quando o nome do arquivo não traz o trimestre
+    caminho: str
+
+
+def listar(pasta=None):
+    """Relatórios da pasta, ordenados por empresa e trimestre."""
+    pasta = pasta or RELATORIOS_DIR
+    try:
+        nomes = os.listdir(pasta)
+    except OSError:
+        return []
+    relatorios = []
+    for nome in nomes:
+        m = _PADRAO.match(nome)
+        if m and not nome.startswith("~$"):  # ~$ = arquivo de lock do Word
+            relatorios.append(Relatorio(m["empresa"], m["trimestre"] or "", os.path.join(pasta, nome)))
+    return sorted(relatorios, key=lambda r: (r.empresa, r.trimestre))
+
+
+def trimestres(empresa, pasta=None):
+    """Trimestres disponíveis da empresa, do mais recente ao mais antigo."""
+    return [r.trimestre for r in reversed(listar(pasta)) if r.empresa == empresa]
+
+
+def obter(empresa=None, trimestre=None, pasta=None):
+    """Relatório de (empresa, trimestre); sem trimestre, o mais recente; None se não houver."""
+    candidatos = [r for r in listar(pasta)
+                  if (empresa is None or r.empresa == empresa) and (trimestre is None or r.trimestre == trimestre)]
+    return candidatos[-1] if candidatos else None
+
+
+# ————————————————————————————— Conversão —————————————————————————————
+def _run_html(run, part):
+    imagens = [_imagem_html(part, blip.get(qn("r:embed"))) for blip in run.element.iter(qn("a:blip"))]
+    texto = html.escape(run.text).replace("\n", "<br>")
+    if texto:
+        if run.bold:
+            texto = f"<strong>{texto}</strong>"
+        if run.italic:
+            texto = f"<em>{texto}</em>"
+        if run.underline:
+            texto = f"<u>{texto}</u>"
+    return "".join(imagens) + texto
+
+
+def _runs_html(paragrafo):
+    partes = []
+    for item in paragrafo.iter_inner_content():
+        if hasattr(item, "runs"):  # hyperlink: agrupa runs
+            texto = "".join(_run_html(run, paragrafo.part) for run in item.runs)
+            partes.append(f'<a href="{html.escape(item.address)}">{texto}</a>' if item.address else texto)
+        else:
+            partes.append(_run_html(item, paragrafo.part))
+    return "".join(partes)
+
+
+def _imagem_html(part, rel_id):
+    try:
+        imagem = part.related_parts[rel_id]
+    except KeyError:
+        return ""
+    dados = base64.b64encode(imagem.blob).decode()
+    return f'<img src="data:{imagem.content_type};base64,{dados}" style="max-width:100%;">'
+
+
+def _nivel_titulo(estilo):
+    if estilo == "Title":
+        return 1
+    m = re.match(r"Heading (\d)", estilo)
+    return min(int(m.group(1)) + 1, 6) if m else None
+
+
+def _tabela_html(tabela):
+    linhas = []
+    for i, linha in enumerate(tabela.rows):
+        tag = "th" if i == 0 else "td"
+        celulas = "".join(f"<{tag}>{'<br>'.join(_runs_html(p) for p in celula.paragraphs)}</{tag}>"
+                          for celula in linha.cells)
+        linhas.append(f"<tr>{celulas}</tr>")
+    return f"<table>{''.join(linhas)}</table>"
+
+
+def converter(caminho):
+    """HTML do documento, na ordem do corpo (parágrafos e tabelas intercalados)."""
+    doc = Document(caminho)
+    saida, lista = [], None  # lista: tag da lista aberta ("ul"/"ol")
+    for elemento in doc.element.body.iterchildren():
+        if elemento.tag == qn("w:tbl"):
+            bloco, tag_lista = _tabela_html(Table(elemento, doc)), None
+        elif elemento.tag == qn("w:p"):
+            paragrafo = Paragraph(elemento, doc)
+            estilo = paragrafo.style.name if paragrafo.style is not None else ""
+            conteudo = _runs_html(paragrafo)
+            if not conteudo.strip():
+                continue
+            nivel = _nivel_titulo(estilo)
+            tag_lista = ("ol" if "Number" in estilo else "ul") if estilo.startswith("List") else None
+            if nivel:
+                bloco = f"<h{nivel}>{conteudo}</h{nivel}>"
+            elif tag_lista:
+                bloco = f"<li>{conteudo}</li>"
+            else:
+                bloco = f"<p>{conteudo}</p>"
+        else:
+            continue
+        if lista and tag_lista != lista:
+            saida.append(f"</{lista}>")
+            lista = None
+        if tag_lista and lista is None:
+            saida.append(f"<{tag_lista}>")
+            lista = tag_lista
+        saida.append(bloco)
+    if lista:
+        saida.append(f"</{lista}>")
+    return "\n".join(saida)
+
+
+# ————————————————————————————— Cache por hash —————————————————————————————
+@lru_cache(maxsize=64)
+def _hash(caminho, mtime_ns, tamanho):
+    # mtime/tamanho na chave: o arquivo só é relido quando muda
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+_html = {}
+_lock = threading.Lock()
+
+
+def html_do_relatorio(caminho):
+    """HTML do .docx, convertido só na primeira vez que cada conteúdo (sha256) aparece."""
+    info = os.stat(caminho)
+    chave = f"{_hash(os.path.abspath(caminho), info.st_mtime_ns, info.st_size)}-v{VERSAO_CONVERSAO}"
+    with _lock:
+        if chave in _html:
+            return _html[chave]
+        arquivo = os.path.join(CACHE_DIR, f"{chave}.html")
+        try:
+            with open(arquivo, encoding="utf-8") as f:
+                conteudo = f.read()
+        except OSError:
+            conteudo = converter(caminho)
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                with open(arquivo + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(conteudo)
+                os.replace(arquivo + ".tmp", arquivo)
+            except OSError:
+                pass  # sem permissão de escrita: fica só em memória
+        if len(_html) >= 32:
+            _html.clear()
+        _html[chave] = conteudo
+        return conteudo
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from sqlalchemy import text
+
+# Custo do bcrypt e tamanho do pool de hash (ajustáveis por variável de ambiente)
+BCRYPT_ROUNDS = int(os.environ.get("PORTAL_BCRYPT_ROUNDS", 12))
+MAX_WORKERS = int(os.environ.get("PORTAL_BCRYPT_WORKERS", 4))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bcrypt")
+_lock = threading.Lock()
+_stats = {"submitted": 0, "completed": 0, "queued": 0, "running": 0,
+          "wait_total": 0.0, "run_total": 0.0, "wait_max": 0.0}
+
+
+def _instrumentado(fn, *args):
+    enviado = time.perf_counter()
+    with _lock:
+        _stats["submitted"] += 1
+        _stats["queued"] += 1
+
+    def tarefa():
+        inicio = time.perf_counter()
+        espera = inicio - enviado
+        with _lock:
+            _stats["queued"] -= 1
+            _stats["running"] += 1
+            _stats["wait_total"] += espera
+            _stats["wait_max"] = max(_stats["wait_max"], espera)
+        try:
+            return fn(*args)
+        finally:
+            with _lock:
+                _stats["running"] -= 1
+                _stats["completed"] += 1
+                _stats["run_total"] += time.perf_counter() - inicio
+
+    return _executor.submit(tarefa)
+
+
+def hash_password(password, rounds=None):
+    """Gera o hash bcrypt fora da thread do script, respeitando o limite de workers."""
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return _instrumentado(bcrypt.hashpw, password.encode(), salt).result().decode()
+
+
+def verify_password(password, password_hash):
+    return _instrumentado(bcrypt.checkpw, password.encode(), password_hash.encode()).result()
+
+
+def needs_rehash(password_hash):
+    # Formato $2b$<custo>$...: refaz o hash quando o custo configurado mudou
+    try:
+        return int(password_hash.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def rehash_in_background(engine, user_id, password):
+    """Atualiza o hash do usuário com o custo atual sem segurar o login."""
+    def tarefa():
+        novo = bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE users SET password_hash=:ph WHERE id=:id"),
+                         {"ph": novo, "id": user_id})
+
+    return _instrumentado(tarefa)
+
+
+def metrics():
+    """Fila e tempos do pool de hash (para ajustar custo x vazão)."""
+    with _lock:
+        s = dict(_stats)
+    feitos = s["completed"] or 1
+    return {
+        "workers": MAX_WORKERS,
+        "rounds": BCRYPT_ROUNDS,
+        "submitted": s["submitted"],
+        "completed": s["completed"],
+        "queued": s["queued"],
+        "running": s["running"],
+        "avg_wait_ms": 1000 * s["wait_total"] / feitos,
+        "max_wait_ms": 1000 * s["wait_max"],
+        "avg_run_ms": 1000 * s["run_total"] / feitos,
+    }
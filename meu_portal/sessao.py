@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+SESSION_TTL = int(os.environ.get("PORTAL_SESSION_TTL", 8 * 3600))
+USER_CACHE_TTL = int(os.environ.get("PORTAL_USER_CACHE_TTL", 300))
+LOGIN_MAX_ATTEMPTS = int(os.environ.get("PORTAL_LOGIN_MAX_ATTEMPTS", 5))
+LOGIN_WINDOW = int(os.environ.get("PORTAL_LOGIN_WINDOW", 300))
+# E-mails com falhas guardados; acima disso saem os de falha mais antiga
+LOGIN_MAX_EMAILS = int(os.environ.get("PORTAL_LOGIN_MAX_EMAILS", 10000))
+
+# Sem segredo configurado, usa um aleatório: tokens deixam de valer ao reiniciar o processo
+_secret = os.environ.get("PORTAL_SESSION_SECRET", "").encode() or os.urandom(32)
+
+_lock = threading.Lock()
+_users = {}     # user_id -> (expira_em, registro)
+_attempts = {}  # email -> [timestamps de falhas], em ordem da última falha
+
+
+def configure(secret):
+    global _secret
+    if secret:
+        _secret = secret.encode()
+
+
+# ————————————————————————————— Token assinado —————————————————————————————
+def _assinar(payload):
+    mac = hmac.new(_secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac).decode().rstrip("=")
+
+
+def emitir_token(user_id, ttl=SESSION_TTL):
+    payload = f"{user_id}.{int(time.time()) + ttl}"
+    return f"{payload}.{_assinar(payload)}"
+
+
+def validar_token(token):
+    """Retorna o user_id do token, ou None se a assinatura não confere ou expirou (sem ir ao banco)."""
+    try:
+        user_id, expira, assinatura = token.split(".")
+        payload = f"{user_id}.{expira}"
+        if not hmac.compare_digest(assinatura, _assinar(payload)):
+            return None
+        user_id, expira = int(user_id), int(expira)
+    except (AttributeError, TypeError, ValueError):  # TypeError: assinatura com caracteres não ASCII
+        return None
+    if expira < time.time():
+        return None
+    return user_id
+
+
+# ————————————————————————————— Cache de usuários —————————————————————————————
+def lembrar_usuario(registro):
+    with _lock:
+        _users[registro["id"]] = (time.time() + USER_CACHE_TTL, dict(registro))
+
+
+def get_user(engine, user_id):
+    """Registro (id, name, role, is_active) do usuário; só consulta o banco quando o TTL vence."""
+    with _lock:
+        item = _users.get(user_id)
+    if item and item[0] > time.time():
+        return item[1]
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT id, name, role, is_active FROM users WHERE id=:id"),
+            {"id": user_id}
+        ).mappings().fetchone()
+    if row is None:
+        invalidar_usuario(user_id)
+        return None
+    lembrar_usuario(row)
+    return dict(row)
+
+
+def invalidar_usuario(user_id):
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def desativar_usuario(engine, user_id):
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE users SET is_active=FALSE WHERE id=:id"), {"id": user_id})
+    invalidar_usuario(user_id)
+
+
+def usuario_da_sessao(engine, token):
+    """Usuário ativo dono do token, ou None (sessão inválida/expirada ou usuário desativado)."""
+    user_id = validar_token(token)
+    if user_id is None:
+        return None
+    user = get_user(engine, user_id)
+    if not user or not user["is_active"]:
+        return None
+    return user
+
+
+# ————————————————————————————— Limite de tentativas —————————————————————————————
+def _recentes(email, agora):
+    return [t for t in _attempts.get(email, []) if agora - t < LOGIN_WINDOW]
+
+
+def login_bloqueado(email):
+    """Segundos até liberar novas tentativas para o e-mail (0 = liberado)."""
+    email = email.strip().lower()
+    agora = time.time()
+    with _lock:
+        recentes = _recentes(email, agora)
+        if recentes:
+            _attempts[email] = recentes
+        else:
+            _attempts.pop(email, None)
+    if len(recentes) < LOGIN_MAX_ATTEMPTS:
+        return 0
+    return int(LOGIN_WINDOW - (agora - recentes[0])) + 1
+
+
+def _podar_tentativas(agora):
+    # Com _lock. _attempts está em ordem da última falha: vencidos e excedentes ficam no começo
+    while _attempts:
+        email, falhas = next(iter(_attempts.items()))
+        if agora - falhas[-1] < LOGIN_WINDOW and len(_attempts) <= LOGIN_MAX_EMAILS:
+            break
+        del _attempts[email]
+
+
+def registrar_falha(email):
+    email = email.strip().lower()
+    agora = time.time()
+    with _lock:
+        falhas = _recentes(email, agora) + [agora]
+        _attempts.pop(email, None)
+        _attempts[email] = falhas  # vai para o fim: é a falha mais recente
+        _podar_tentativas(agora)
+
+
+def limpar_tentativas(email):
+    with _lock:
+        _attempts.pop(email.strip().lower(), None)